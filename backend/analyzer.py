@@ -1,34 +1,137 @@
 import re
+import sys
+import hashlib
+import os
+from collections import Counter
 from datetime import datetime
 from typing import List, Optional
 from models import AnalyzeRequest, AnalyzeResponse, Participant, ByeInfo, TimelineEvent
-from parser import parse_log, FROM_RE, TO_RE, UA_RE, REASON_RE, _normalize_number
+from parser import (parse_blocks, FROM_RE, TO_RE, UA_RE, REASON_RE, SIP_START_RE,
+                    CALLID_RE, BYE_LINE_RE, _normalize_number, _percentiles,
+                    _extract_blocks, _prefilter_blocks, _subscriber_terms)
+from sources import merge_sources
+from quick import quick_look
+from store import ResultStore
+from logview import LogView
+from rates import rebin, _epoch
 
 TS_FMT = "%Y-%m-%d_%H:%M:%S.%f"
 
+# Tokenized logs kept for re-analysis, and parse results kept per log (by subscriber filter)
+PARSE_CACHE_MAX  = int(os.environ.get("SIP_PARSE_CACHE_MAX", "4"))
+PARSE_SIGNATURES = 8
+parsed_logs = ResultStore(PARSE_CACHE_MAX)
+PGW_DELETE_RE = re.compile(r'pgw/session/delete[^\n]*?(\d{15,})')
+LEADING_PLUS_RE = re.compile(r'^\+')
+HANGUP_CAUSE_RE = re.compile(r'X-Asterisk-HangupCause[:\s]+([^\r\n]+)')
+HANGUP_CODE_RE  = re.compile(r'X-Asterisk-HangupCauseCode[:\s]+(\d+)')
+DESC_CALLID_RE  = re.compile(r'Call-ID:\s*(\S+)')
+
+# Q.850 release causes reported via X-Asterisk-HangupCauseCode / Reason
+Q850_CAUSES = {
+    '16': 'Normal call clearing',
+    '17': 'User busy',
+    '18': 'No user responding',
+    '19': 'No answer from user',
+    '21': 'Call rejected',
+    '31': 'Normal, unspecified',
+}
+
 def _ts(s):
     try: return datetime.strptime(s, TS_FMT)
     except: return None
 
-def analyze(req: AnalyzeRequest) -> AnalyzeResponse:
-    parsed    = parse_log(req.log)
+class UnknownLogHash(LookupError):
+    """``log_hash`` was sent without the log and is not (or no longer) cached."""
+
+def log_hash(log: str) -> str:
+    return hashlib.blake2b(log.encode('utf-8', 'replace'), digest_size=16).hexdigest()
+
+def _cached_log(req: AnalyzeRequest):
+    """(hash, cache entry) for ``req.log``, tokenizing it on first sight.
+
+    A client ``log_hash`` is only used to look the log up when ``log`` is
+    absent; a sent log is always hashed here, so it cannot be cached under
+    someone else's key.
+    """
+    key   = log_hash(req.log) if req.log else req.log_hash
+    entry = parsed_logs.get(key)
+    if entry is None:
+        if not req.log: raise UnknownLogHash(key)
+        entry = {'log': req.log, 'blocks': _extract_blocks(req.log), 'parsed': {}, 'view': None}
+        parsed_logs.put(entry, key=key)
+    return key, entry
+
+def _cached_parse(entry, terms) -> dict:
+    """parse_blocks result for one subscriber filter signature, memoized per log."""
+    sig    = tuple(terms)
+    parsed = entry['parsed'].pop(sig, None)
+    if parsed is None:
+        blocks = _prefilter_blocks(entry['blocks'], terms) if terms else entry['blocks']
+        parsed = parse_blocks(blocks)
+        if len(entry['parsed']) >= PARSE_SIGNATURES:
+            entry['parsed'].pop(next(iter(entry['parsed'])))
+    entry['parsed'][sig] = parsed                   # re-insert: most recently used last
+    return parsed
+
+def cached_view(key: str):
+    """Shared LogView for a cached log (built once, on first request)."""
+    entry = parsed_logs.get(key) if key else None
+    if entry is None: return None
+    if entry['view'] is None: entry['view'] = LogView(entry['log'])
+    return entry['view']
+
+def analyze(req: AnalyzeRequest, blocks=None) -> AnalyzeResponse:
+    """Analyze ``req.log``, the merged ``req.sources`` or pre-merged ``blocks``.
+
+    Inline logs (or a ``log_hash`` of one sent earlier) go through the parse
+    cache: tokenized blocks are kept per log hash and parse results per
+    subscriber filter, so changing only flags or numbers skips re-parsing.
+    """
     flags     = [f.lower() for f in (req.flags or [])]
     full      = "+full" in flags
+    if "+quick" in flags and blocks is None:
+        return _quick(req)
+
+    key = entry = None
+    if blocks is None:
+        if req.sources:
+            blocks = merge_sources(req.sources)
+        elif req.log or req.log_hash:
+            key, entry = _cached_log(req)
+        else:
+            raise ValueError("No log provided")
 
     # Normalize input numbers for matching
-    caller_norm = _normalize_number(re.sub(r'^\+', '', req.caller or ''))
-    callee_norm = _normalize_number(re.sub(r'^\+', '', req.callee or ''))
+    caller_norm = _normalize_number(LEADING_PLUS_RE.sub('', req.caller or ''))
+    callee_norm = _normalize_number(LEADING_PLUS_RE.sub('', req.callee or ''))
     caller_imsi = req.caller_imsi or ''
     callee_imsi = req.callee_imsi or ''
 
     # Build relevant number set for filtering
     relevant = set(filter(None, [caller_norm, callee_norm, caller_imsi, callee_imsi]))
 
+    # Drop other subscribers' dialogs before any per-block regex work
+    terms = _subscriber_terms([caller_norm, callee_norm], [caller_imsi, callee_imsi]) \
+            if relevant else []
+    if entry is not None:
+        parsed = _cached_parse(entry, terms)
+    else:
+        parsed = parse_blocks(_prefilter_blocks(blocks, terms) if terms else blocks)
+
+    routing_rows = None
+    if "+routing" in flags or full:
+        if "routing_rows" not in parsed:
+            parsed["routing_rows"] = _routing_table(parsed["raw_blocks"])
+        routing_rows = parsed["routing_rows"]
+
     timeline  = _filter_timeline(parsed["timeline"], relevant) \
                 if relevant else parsed["timeline"]
+    call_duration, answer_time, ring_time = _timing(timeline)
 
     return AnalyzeResponse(
         participants  = _build_participants(req, parsed["participants"],
+                                           parsed["participant_index"],
                                            caller_norm, callee_norm,
                                            caller_imsi, callee_imsi),
         timeline      = timeline,
@@ -36,15 +139,34 @@ def analyze(req: AnalyzeRequest) -> AnalyzeResponse:
                                      caller_norm, callee_norm, caller_imsi, callee_imsi),
         rtp_stats     = _filter_rtp(parsed["rtp_stats"], caller_norm, callee_norm),
         anomalies     = parsed["anomalies"],
-        call_duration = _timing(timeline)[0],
-        answer_time   = _timing(timeline)[1],
-        ring_time     = _timing(timeline)[2],
+        anomaly_details = parsed["anomaly_details"],
+        call_duration = call_duration,
+        answer_time   = answer_time,
+        ring_time     = ring_time,
         sdp_info      = parsed["sdp_info"]   if "+sdp"     in flags or full else None,
         data_usage    = parsed["data_usage"] if "+pgw"     in flags or full else None,
         pgw_events    = parsed["pgw_events"] if "+pgw"     in flags or full else None,
-        routing_info  = _routing(parsed["raw_blocks"]) if "+routing" in flags or full else None,
+        diameter_latency = parsed["diameter_latency"] if "+pgw" in flags or full else None,
+        routing_info  = _routing(routing_rows) if routing_rows is not None else None,
+        routing_stats = _routing_stats(routing_rows) if routing_rows is not None else None,
+        hop_latency   = parsed["hop_latency"] or None,
+        transaction_latency = parsed["transaction_latency"]
+                              if "+latency" in flags or full else None,
+        log_hash      = key,
+        signaling_rates = rebin(parsed["rates"], req.rate_step or 0)
+                          if "+rates" in flags or full else None,
     )
 
+def _quick(req: AnalyzeRequest) -> AnalyzeResponse:
+    """+quick: sampled traffic shape of ``req.log`` / ``req.sources``, no timeline."""
+    if not req.sources and not req.log:
+        if not req.log_hash: raise ValueError("No log provided")
+        req = req.model_copy(update={'log': _cached_log(req)[1]['log']})
+    quick = quick_look(req)
+    anomalies = [f"~{a['estimate']} {rule} (95% CI {a['ci95'][0]}–{a['ci95'][1]}, "
+                 f"{a['sample']} in sample)" for rule, a in quick['anomalies'].items()]
+    return AnalyzeResponse(anomalies=anomalies, quick_look=quick)
+
 def _is_relevant(body: str, relevant: set) -> bool:
     """Return True if any relevant number/IMSI appears in this SIP block."""
     if not relevant:
@@ -79,26 +201,24 @@ def _filter_rtp(rtp_stats, caller_norm, callee_norm):
     if callee_norm: relevant.add(f"+{callee_norm}")
     return [r for r in rtp_stats if r.leg in relevant]
 
-def _build_participants(req, detected, caller_norm, callee_norm,
+def _build_participants(req, detected, index, caller_norm, callee_norm,
                         caller_imsi, callee_imsi) -> List[Participant]:
     result = []
     used   = set()
 
-    def _find_device_ip(norm):
-        """Find device and IP from detected participants."""
-        for p in detected:
-            p_norm = _normalize_number(re.sub(r'^\+', '', p.number or ''))
-            if p_norm == norm:
-                return p.device, p.ip
-        return None, None
+    def _find_device_ip(norm, imsi):
+        """Find device and IP from detected participants by number, then IMSI."""
+        p = index['by_number'].get(norm) or index['by_imsi'].get(imsi)
+        return (p.device, p.ip) if p else (None, None)
 
-    # Add caller if provided
+    # Add caller if provided; an IMSI not given is taken from the log's MSISDN → IMSI index
     if req.caller:
-        ua, ip = _find_device_ip(caller_norm)
+        caller_imsi = caller_imsi or index['imsi_by_number'].get(caller_norm, '')
+        ua, ip = _find_device_ip(caller_norm, caller_imsi)
         result.append(Participant(
             role   = 'Caller (MO)',
             number = req.caller if req.caller.startswith('+') else f'+{caller_norm}',
-            imsi   = req.caller_imsi or None,
+            imsi   = caller_imsi or None,
             device = ua,
             ip     = ip
         ))
@@ -106,11 +226,12 @@ def _build_participants(req, detected, caller_norm, callee_norm,
 
     # Add callee if provided
     if req.callee:
-        ua, ip = _find_device_ip(callee_norm)
+        callee_imsi = callee_imsi or index['imsi_by_number'].get(callee_norm, '')
+        ua, ip = _find_device_ip(callee_norm, callee_imsi)
         result.append(Participant(
             role   = 'Callee (MT)',
             number = req.callee if req.callee.startswith('+') else f'+{callee_norm}',
-            imsi   = req.callee_imsi or None,
+            imsi   = callee_imsi or None,
             device = ua,
             ip     = ip
         ))
@@ -119,8 +240,7 @@ def _build_participants(req, detected, caller_norm, callee_norm,
     # Only add extra detected participants if they are NOT already listed
     # and if no caller/callee was specified (open analysis mode)
     if not req.caller and not req.callee:
-        for p in detected:
-            p_norm = _normalize_number(re.sub(r'^\+', '', p.number or ''))
+        for p_norm, p in index['by_number'].items():
             if p_norm not in used:
                 used.add(p_norm)
                 result.append(p)
@@ -130,7 +250,7 @@ def _build_participants(req, detected, caller_norm, callee_norm,
 def _analyze_bye(req, raw_blocks, anomalies, caller_norm, callee_norm, caller_imsi='', callee_imsi=''):
     bye_block = None
     for ts, module, body in raw_blocks:
-        if not re.search(r'^BYE\s+', body, re.MULTILINE):
+        if not BYE_LINE_RE.search(body):
             continue
         # If we have caller/callee, verify this BYE belongs to our call
         if caller_norm or callee_norm:
@@ -166,33 +286,22 @@ def _analyze_bye(req, raw_blocks, anomalies, caller_norm, callee_norm, caller_im
             evidence.append("Device de-registered immediately after BYE")
             break
     # Check hangup cause
-    hup = re.search(r'X-Asterisk-HangupCause[:\s]+([^\r\n]+)', body)
-    hup_code = re.search(r'X-Asterisk-HangupCauseCode[:\s]+(\d+)', body)
+    hup = HANGUP_CAUSE_RE.search(body)
+    hup_code = HANGUP_CODE_RE.search(body)
     if hup:
         evidence.append(f"Hangup cause: {hup.group(1).strip()}")
     if hup_code:
-        cause_map = {
-            '16': 'Normal call clearing',
-            '17': 'User busy',
-            '18': 'No user responding',
-            '19': 'No answer from user',
-            '21': 'Call rejected',
-            '31': 'Normal, unspecified',
-        }
         code = hup_code.group(1)
-        desc = cause_map.get(code, 'Unknown cause')
+        desc = Q850_CAUSES.get(code, 'Unknown cause')
         evidence.append(f"Q.850 cause {code}: {desc}")
 
-    pgw_re = re.compile(
-        r'(\d{4}-\d{2}-\d{2}_\d{2}:\d{2}:\d{2}\.\d+).*?'
-        r'pgw/session/delete.*?(\d{15,})'
-    )
     bye_ts = _ts(ts)
-    for line in req.log.splitlines():
-        m = pgw_re.search(line)
+    for pgw_ts_s, _, b in raw_blocks:
+        if 'pgw/session/delete' not in b: continue
+        m = PGW_DELETE_RE.search(b)
         if m:
-            pgw_ts = _ts(m.group(1))
-            imsi   = m.group(2)
+            pgw_ts = _ts(pgw_ts_s)
+            imsi   = m.group(1)
             if bye_ts and pgw_ts and pgw_ts <= bye_ts:
                 if not caller_imsi and not callee_imsi:
                     evidence.append(f"PGW session for IMSI {imsi} torn down before/at BYE")
@@ -218,22 +327,28 @@ def _timing(timeline):
     for ev in timeline:
         if ev.method == "INVITE":
             # Extract Call-ID from description
-            cid_m = re.search(r'Call-ID:\s*(\S+)', ev.description)
+            cid_m = DESC_CALLID_RE.search(ev.description)
             if cid_m:
                 anchor_callid = cid_m.group(1)
             invite_ts = _ts(ev.timestamp)
             break
 
     for ev in timeline:
-        t = _ts(ev.timestamp)
-        if not t: continue
-
         # If we have an anchor Call-ID, skip events from other calls
         if anchor_callid:
-            cid_m = re.search(r'Call-ID:\s*(\S+)', ev.description)
+            cid_m = DESC_CALLID_RE.search(ev.description)
             if cid_m and cid_m.group(1) != anchor_callid:
                 continue
 
+        # Timestamps are parsed only for events that can still fill a slot
+        wanted = (ev.method == "INVITE" and invite_ts is None) or \
+                 ("180" in ev.method and ring_ts is None) or \
+                 (ev.method.startswith("200") and answer_ts is None) or \
+                 (ev.method == "BYE" and bye_ts is None)
+        if not wanted: continue
+        t = _ts(ev.timestamp)
+        if not t: continue
+
         if ev.method == "INVITE" and invite_ts is None:
             invite_ts = t
         if "180" in ev.method and ring_ts is None:
@@ -243,6 +358,8 @@ def _timing(timeline):
             answer_ts = t
         if ev.method == "BYE" and bye_ts is None:
             bye_ts = t
+        if invite_ts and ring_ts and answer_ts and bye_ts:
+            break
 
     def fmt(d):
         if d is None: return None
@@ -257,18 +374,85 @@ def _timing(timeline):
         fmt((ring_ts - invite_ts)   if ring_ts and invite_ts  else None),
     )
 
-def _routing(raw_blocks):
-    via_re   = re.compile(r'^Via:\s*(.+)$',   re.MULTILINE)
-    route_re = re.compile(r'^Route:\s*(.+)$', re.MULTILINE)
-    routing  = []
+VIA_RE    = re.compile(r'^(?:Via|v):\s*(.+)$', re.MULTILINE)
+ROUTE_RE  = re.compile(r'^Route:\s*(.+)$', re.MULTILINE)
+VIA_HOP_RE = re.compile(r'SIP/2\.0/(\w+)\s+\[?([^\s;:\]]+)\]?(?::(\d+))?([^,]*)')
+VIA_PARAM_RE = re.compile(r';\s*(branch|received|rport)(?:=([^;,\s]*))?')
+ROUTE_HOST_RE = re.compile(r'sips?:(?:[^@>;]+@)?([^:;>]+)')
+ROUTING_TABLE_MAX = 1000
+
+def _routing_table(raw_blocks):
+    """Structured Via/Route hop table for INVITE/BYE/CANCEL requests.
+
+    Each row is ``(ts, method, call_id, start_line, vias, routes, headers)``;
+    a via is ``(host, port, transport, branch, received, rport)`` and feeds the
+    stats, while ``headers`` keeps the raw ``(name, value)`` Via/Route lines for
+    display. Host, transport and received strings are interned so busy-hour
+    logs share one copy per peer.
+    """
+    intern = sys.intern
+    rows = []
     for ts, _, body in raw_blocks:
-        first = body.strip().splitlines()[0].strip() if body.strip() else ""
-        if re.match(r'^(INVITE|BYE|CANCEL)\s+', first):
-            vias   = via_re.findall(body)
-            routes = route_re.findall(body)
-            if vias or routes:
-                entry  = f"[{ts}] {first[:70]}"
-                entry += "".join(f"\n  Via: {v.strip()}"   for v in vias)
-                entry += "".join(f"\n  Route: {r.strip()}" for r in routes)
-                routing.append(entry)
+        start = SIP_START_RE.search(body)
+        if not start or start.group(0).split(None, 1)[0] not in ('INVITE', 'BYE', 'CANCEL'):
+            continue
+        vias = []
+        via_headers = VIA_RE.findall(body)
+        for header in via_headers:
+            for hop in VIA_HOP_RE.finditer(header):
+                params = dict(VIA_PARAM_RE.findall(hop.group(4)))
+                vias.append((intern(hop.group(2)), hop.group(3) or '',
+                             intern(hop.group(1).upper()), params.get('branch', ''),
+                             intern(params['received']) if params.get('received') else '',
+                             params.get('rport', '')))
+        route_headers = ROUTE_RE.findall(body)
+        routes = tuple(intern(h) for r in route_headers for h in ROUTE_HOST_RE.findall(r))
+        if vias or routes:
+            cid = CALLID_RE.search(body)
+            headers = tuple([('Via', v.strip()) for v in via_headers] +
+                            [('Route', r.strip()) for r in route_headers])
+            rows.append((ts, intern(start.group(0).split(None, 1)[0]),
+                         cid.group(1) if cid else '', start.group(0), tuple(vias), routes, headers))
+    return rows
+
+def _routing_stats(rows):
+    """Hop-count histogram, most common paths and per-hop latency.
+
+    A request seen again with more Via headers has crossed another proxy;
+    the time between the two sightings is charged to the new top-Via host.
+    """
+    hop_counts = Counter()
+    paths      = Counter()
+    samples    = {}
+    last       = {}
+    for ts, method, cid, _, vias, routes, _ in rows:
+        hop_counts[len(vias)] += 1
+        # Vias are stacked top-first — the path runs from the bottom (origin) up
+        paths[tuple(v[0] for v in reversed(vias))] += 1
+        key = (cid, method)
+        t   = _epoch(ts)
+        prev = last.get(key)
+        if prev and t is not None and len(vias) > prev[1] and vias:
+            samples.setdefault(vias[0][0], []).append((t - prev[0]) * 1000)
+        if t is not None:
+            last[key] = (t, len(vias))
+    return {
+        'hop_counts':  {str(k): v for k, v in sorted(hop_counts.items())},
+        'top_paths':   [{'path': ' → '.join(p), 'count': c} for p, c in paths.most_common(10)],
+        'hop_latency': {h: _percentiles(v) for h, v in sorted(samples.items())},
+        'hosts':       len({v[0] for r in rows for v in r[4]}),
+        'table':       [{'timestamp': ts, 'method': m, 'call_id': cid,
+                         'vias': [dict(zip(('host', 'port', 'transport', 'branch', 'received', 'rport'), v))
+                                  for v in vias],
+                         'routes': list(routes)}
+                        for ts, m, cid, _, vias, routes, _ in rows[:ROUTING_TABLE_MAX]],
+        'truncated':   len(rows) > ROUTING_TABLE_MAX,
+    }
+
+def _routing(rows):
+    routing = []
+    for ts, _, _, first, _, _, headers in rows:
+        entry  = f"[{ts}] {first[:70]}"
+        entry += "".join(f"\n  {name}: {value}" for name, value in headers)
+        routing.append(entry)
     return routing
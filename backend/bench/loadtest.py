@@ -0,0 +1,281 @@
+"""Concurrent HTTP load test against a local uvicorn instance of ``main.app``.
+
+    python bench/loadtest.py [--workers 1,2] [--concurrency 1,4,16] [--duration 20]
+                             [--sizes 1,50,500] [--mix analyze=5,upload=2,csv=2,pdf=1]
+                             [--out result.json] [--baseline previous.json]
+
+For every (workers, concurrency) pair a fresh server is started, then
+``concurrency`` keep-alive clients replay a weighted mix of /analyze,
+/analyze/upload, /export/csv and /export/pdf with synthetic logs of the
+given sizes (in calls) for ``duration`` seconds. Meanwhile a probe polls
+/health: its latency is the event-loop lag an idle request sees. Server RSS
+(all worker processes) is sampled alongside.
+
+Results are written as JSON; ``--baseline`` prints the change per step
+against an earlier result file.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+from warmup import _warmup_log   # noqa: E402
+
+OPS = ('analyze', 'upload', 'csv', 'pdf')
+PROBE_EVERY_S = 0.1
+
+
+def _log(calls: int) -> str:
+    """``calls`` copies of the warm-up call, each with its own Call-ID and branches."""
+    one = _warmup_log()
+    return ''.join(one.replace('warmup@', f'warmup{i}@').replace('z9hG4bKwarm', f'z9hG4bKwarm{i}x')
+                   for i in range(calls))
+
+
+def _salted(log: str, seq: int) -> str:
+    """Make every request's log distinct so the parse cache does not answer it."""
+    return f"2024-01-01_00:00:00.000000 <loadtest:ALL> request {seq}\n" + log
+
+
+def _multipart(fields: dict, filename: str, content: bytes):
+    boundary = uuid.uuid4().hex
+    parts = [f'--{boundary}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n'.encode()
+             for k, v in fields.items()]
+    parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+                 f'Content-Type: text/plain\r\n\r\n'.encode() + content + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def _request(op: str, log: str):
+    """(method, path, body, content-type) for one operation of the mix."""
+    if op == 'upload':
+        body, ctype = _multipart({'flags': '["+full"]'}, 'load.log', log.encode())
+        return 'POST', '/analyze/upload', body, ctype
+    path = {'analyze': '/analyze', 'csv': '/export/csv', 'pdf': '/export/pdf'}[op]
+    flags = ['+full'] if op == 'analyze' else []
+    return 'POST', path, json.dumps({'log': log, 'flags': flags}).encode(), 'application/json'
+
+
+def _pct(values, q: float):
+    if not values: return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 2)
+
+
+def _summary(ms) -> dict:
+    return {'count': len(ms), 'p50': _pct(ms, 0.50), 'p95': _pct(ms, 0.95), 'p99': _pct(ms, 0.99),
+            'max': round(max(ms), 2) if ms else None}
+
+
+def _rss_mb(pid: int) -> float:
+    """Resident memory of ``pid`` and its descendants (Linux /proc)."""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit(): continue
+        try:
+            with open(f'/proc/{entry}/stat') as fh:
+                ppid = int(fh.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    total, todo = 0, [pid]
+    while todo:
+        p = todo.pop()
+        todo.extend(children.get(p, []))
+        try:
+            with open(f'/proc/{p}/status') as fh:
+                total += next(int(l.split()[1]) for l in fh if l.startswith('VmRSS:'))
+        except (OSError, StopIteration):
+            pass
+    return round(total / 1024, 1)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _start_server(workers: int, port: int) -> subprocess.Popen:
+    proc = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1',
+                             '--port', str(port), '--workers', str(workers), '--log-level', 'warning'],
+                            cwd=BACKEND, stdout=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200: return proc
+        except OSError:
+            pass
+        if proc.poll() is not None: break
+        time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"server on port {port} did not become ready")
+
+
+def _client(port: int, deadline: float, pick, results: list, errors: list):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=300)
+    while time.time() < deadline:
+        op, size, log = pick()
+        method, path, body, ctype = _request(op, log)
+        t0 = time.perf_counter()
+        try:
+            conn.request(method, path, body, {'Content-Type': ctype})
+            resp = conn.getresponse()
+            resp.read()
+            ok = resp.status < 400
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn, ok = http.client.HTTPConnection('127.0.0.1', port, timeout=300), False
+        ms = (time.perf_counter() - t0) * 1000
+        (results if ok else errors).append((op, size, ms))
+
+
+def _probe(port: int, pid: int, stop: threading.Event, lag: list, rss: list):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        try:
+            conn.request('GET', '/health')
+            conn.getresponse().read()
+            lag.append((time.perf_counter() - t0) * 1000)
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        rss.append(_rss_mb(pid))
+        stop.wait(PROBE_EVERY_S)
+
+
+def run_step(workers: int, concurrency: int, duration: float, logs: dict, mix: dict,
+             salt: bool, seed: int) -> dict:
+    port = _free_port()
+    proc = _start_server(workers, port)
+    try:
+        rng, seq, lock = random.Random(seed), itertools.count(), threading.Lock()
+        ops = [op for op, w in mix.items() for _ in range(w)]
+
+        def pick():
+            with lock:
+                op, size, n = rng.choice(ops), rng.choice(list(logs)), next(seq)
+            return op, size, _salted(logs[size], n) if salt else logs[size]
+
+        results, errors, lag, rss = [], [], [], []
+        stop = threading.Event()
+        probe = threading.Thread(target=_probe, args=(port, proc.pid, stop, lag, rss), daemon=True)
+        probe.start()
+        deadline = time.time() + duration
+        t0 = time.perf_counter()
+        clients = [threading.Thread(target=_client, args=(port, deadline, pick, results, errors))
+                   for _ in range(concurrency)]
+        for c in clients: c.start()
+        for c in clients: c.join()
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        probe.join()
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    by_op = {op: _summary([ms for o, _, ms in results if o == op]) for op in mix}
+    by_size = {str(size): _summary([ms for _, s, ms in results if s == size]) for size in logs}
+    return {
+        'workers':        workers,
+        'concurrency':    concurrency,
+        'seconds':        round(elapsed, 2),
+        'requests':       len(results),
+        'errors':         len(errors),
+        'throughput_rps': round(len(results) / elapsed, 2),
+        'latency_ms':     _summary([ms for _, _, ms in results]),
+        'by_op':          by_op,
+        'by_size':        by_size,
+        'loop_lag_ms':    _summary(lag),
+        'rss_mb':         {'peak': max(rss) if rss else None, 'end': rss[-1] if rss else None},
+    }
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _compare(result: dict, baseline: dict):
+    old = {(s['workers'], s['concurrency']): s for s in baseline['steps']}
+    print(f"\nvs {baseline['meta'].get('git_rev')} ({baseline['meta'].get('started')}):")
+    for s in result['steps']:
+        b = old.get((s['workers'], s['concurrency']))
+        if not b: continue
+        def delta(new, prev):
+            return f"{(new - prev) / prev * 100:+.0f}%" if new is not None and prev else "n/a"
+        print(f"  w={s['workers']:<3}c={s['concurrency']:<4}"
+              f" rps {delta(s['throughput_rps'], b['throughput_rps']):>6}"
+              f"  p95 {delta(s['latency_ms']['p95'], b['latency_ms']['p95']):>6}"
+              f"  p99 {delta(s['latency_ms']['p99'], b['latency_ms']['p99']):>6}"
+              f"  lag p99 {delta(s['loop_lag_ms']['p99'], b['loop_lag_ms']['p99']):>6}"
+              f"  rss {delta(s['rss_mb']['peak'], b['rss_mb']['peak']):>6}")
+
+
+def _ints(text: str):
+    return [int(x) for x in text.split(',') if x]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--workers", default="1", help="comma-separated uvicorn worker counts")
+    ap.add_argument("--concurrency", default="1,4,16", help="comma-separated client counts")
+    ap.add_argument("--duration", type=float, default=20, help="seconds per step")
+    ap.add_argument("--sizes", default="1,50,500", help="comma-separated log sizes, in calls")
+    ap.add_argument("--mix", default="analyze=5,upload=2,csv=2,pdf=1", help="op=weight list")
+    ap.add_argument("--cache", action="store_true", help="repeat identical logs (parse-cache hits)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", default=None, help="result file (default: loadtest-<time>.json)")
+    ap.add_argument("--baseline", default=None, help="earlier result file to compare against")
+    args = ap.parse_args()
+
+    mix = {op: int(w) for op, w in (kv.split('=') for kv in args.mix.split(','))}
+    unknown = set(mix) - set(OPS)
+    if unknown: ap.error(f"unknown ops in --mix: {', '.join(sorted(unknown))}")
+    logs = {size: _log(size) for size in _ints(args.sizes)}
+    result = {'meta': {'started': time.strftime('%Y-%m-%dT%H:%M:%S'), 'git_rev': _git_rev(),
+                       'python': platform.python_version(), 'cpus': os.cpu_count(),
+                       'duration_s': args.duration, 'mix': mix, 'cache': args.cache,
+                       'log_bytes': {str(k): len(v) for k, v in logs.items()}},
+              'steps': []}
+
+    print(f"{'workers':>7}{'conc':>6}{'req':>7}{'err':>5}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}"
+          f"{'lag p99':>9}{'rss MB':>8}   (latency ms)")
+    for workers in _ints(args.workers):
+        for conc in _ints(args.concurrency):
+            s = run_step(workers, conc, args.duration, logs, mix, not args.cache, args.seed)
+            result['steps'].append(s)
+            lat = s['latency_ms']
+            print(f"{workers:>7}{conc:>6}{s['requests']:>7}{s['errors']:>5}{s['throughput_rps']:>8}"
+                  f"{lat['p50'] or 0:>9}{lat['p95'] or 0:>9}{lat['p99'] or 0:>9}"
+                  f"{s['loop_lag_ms']['p99'] or 0:>9}{s['rss_mb']['peak'] or 0:>8}")
+
+    out = args.out or f"loadtest-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(out, 'w') as fh:
+        json.dump(result, fh, indent=2)
+    print(f"\nwritten {out}")
+    if args.baseline:
+        with open(args.baseline) as fh:
+            _compare(result, json.load(fh))
+
+
+if __name__ == "__main__":
+    main()
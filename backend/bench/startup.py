@@ -0,0 +1,60 @@
+"""Cold-start benchmark: worker import time and first-request latency.
+
+Each run uses a fresh interpreter so nothing is cached between samples.
+
+    python bench/startup.py [--runs 5] [--log path/to/sample.log]
+
+Reports, per mode (warm-up on / off): import time of ``main``, time until
+/health reports ready, and latency of the first and second /analyze calls.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import main
+t_import = time.perf_counter() - t0
+from fastapi.testclient import TestClient
+from warmup import _warmup_log
+log = open(sys.argv[1]).read() if sys.argv[1] else _warmup_log()
+with TestClient(main.app) as client:
+    t0 = time.perf_counter()
+    while client.get('/health').status_code != 200: time.sleep(0.001)
+    t_ready = time.perf_counter() - t0
+    lat = []
+    for _ in range(2):
+        t0 = time.perf_counter()
+        client.post('/analyze', json={'log': log, 'flags': ['+full']}).raise_for_status()
+        lat.append(time.perf_counter() - t0)
+print(json.dumps({'import': t_import, 'ready': t_ready, 'first': lat[0], 'second': lat[1]}))
+"""
+
+def _sample(log: str, warm: bool) -> dict:
+    env = dict(os.environ, SIP_WARMUP="1" if warm else "0")
+    out = subprocess.run([sys.executable, "-c", _CHILD, log], cwd=BACKEND, env=env,
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--log", default="", help="log file for /analyze (default: built-in warm-up log)")
+    args = ap.parse_args()
+    log = os.path.abspath(args.log) if args.log else ""
+
+    print(f"{'mode':<10}{'import':>10}{'ready':>10}{'first':>10}{'second':>10}   (median ms, {args.runs} runs)")
+    for warm in (False, True):
+        samples = [_sample(log, warm) for _ in range(args.runs)]
+        med = {k: statistics.median(s[k] for s in samples) * 1000 for k in samples[0]}
+        print(f"{'warm-up' if warm else 'cold':<10}{med['import']:>10.1f}{med['ready']:>10.1f}"
+              f"{med['first']:>10.1f}{med['second']:>10.1f}")
+
+if __name__ == "__main__":
+    main()
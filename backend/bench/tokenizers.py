@@ -0,0 +1,65 @@
+"""Tokenizer benchmark: format-specific tokenizers vs the generic grep path.
+
+    python bench/tokenizers.py [--calls 500] [--runs 3]
+
+Builds one synthetic log per format from the warm-up call, then times
+``_extract_blocks`` with auto-detection against ``_extract_grep`` (the
+normalize-everything path every log used to take).
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from parser import _extract_blocks, _extract_grep, detect_format   # noqa: E402
+from warmup import _warmup_log                                      # noqa: E402
+
+MODULE_RE = re.compile(r'^(\S+) <[^>]+> ', re.MULTILINE)
+
+
+def _yate(calls: int) -> str:
+    return _warmup_log() * calls
+
+def _engine(calls: int) -> str:
+    return MODULE_RE.sub(r'\1 ', _yate(calls))
+
+def _mixed(calls: int) -> str:
+    one = _warmup_log()
+    return ''.join(one if i % 2 else MODULE_RE.sub(r'\1 ', one) for i in range(calls))
+
+def _grep(calls: int) -> str:
+    """grep -A output: prompt line, '--' separators, header lines joined by spaces."""
+    blocks = re.split(r'\n(?=\d{4}-)', _yate(calls))
+    return '[root@pcscf ~]# grep -A20 INVITE yate.log\n' + '\n--\n'.join(
+        re.sub(r'\n(?=[A-Z][\w-]*: )', ' ', b) for b in blocks)
+
+FORMATS = {'yate': _yate, 'engine': _engine, 'mixed': _mixed, 'grep': _grep}
+
+
+def _best(fn, log: str, runs: int) -> float:
+    best = float('inf')
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn(log)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--calls", type=int, default=500)
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args()
+
+    print(f"{'format':<8}{'detected':>10}{'MB':>7}{'blocks':>8}{'generic ms':>12}{'fast ms':>10}{'speedup':>9}")
+    for name, build in FORMATS.items():
+        log = build(args.calls)
+        generic = _best(_extract_grep, log, args.runs)
+        fast    = _best(_extract_blocks, log, args.runs)
+        print(f"{name:<8}{detect_format(log):>10}{len(log) / 1e6:>7.1f}{len(_extract_blocks(log)):>8}"
+              f"{generic:>12.1f}{fast:>10.1f}{generic / fast:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Bulk call-detail records: one compact record per call, in a single streaming pass.
+
+    python cdr.py day.log [--format csv] > day.csv
+"""
+import csv
+import io
+import os
+import re
+import sys
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, Optional
+from pydantic_core import to_json
+from parser import (Block, SIP_START_RE, CALLID_RE, CSEQ_RE, FROM_RE, TO_RE, RTP_RE, REASON_RE,
+                    IMSI_URI_RE, _normalize_number, _sdp_media)
+from analyzer import Q850_CAUSES, HANGUP_CODE_RE
+from rates import _epoch
+
+CDR_MAX_ACTIVE = int(os.environ.get("SIP_CDR_MAX_ACTIVE", "200000"))
+CDR_IDLE_S     = int(os.environ.get("SIP_CDR_IDLE_S", "14400"))   # unanswered/lost-BYE dialogs
+SWEEP_EVERY    = 10000                                            # blocks between idle sweeps
+
+CDR_FIELDS = ['call_id', 'caller', 'callee', 'caller_imsi', 'callee_imsi',
+              'setup_ts', 'ring_ts', 'answer_ts', 'end_ts', 'ring_ms', 'answer_ms', 'duration_s',
+              'status', 'final_code', 'release_side', 'cause_code', 'cause_text', 'codec',
+              'rtp_ps', 'rtp_pr', 'rtp_pl', 'rtp_ji', 'node']
+
+TO_TAG_RE       = re.compile(r'^(?:To|t):[^\r\n]*;tag=', re.MULTILINE | re.IGNORECASE)
+REASON_CAUSE_RE = re.compile(r'cause=(\d+)(?:[^\r\n]*?text="([^"]*)")?', re.IGNORECASE)
+
+
+def _ms(a: Optional[str], b: Optional[str]) -> Optional[int]:
+    ta, tb = (_epoch(a), _epoch(b)) if a and b else (None, None)
+    return round((tb - ta) * 1000) if ta is not None and tb is not None else None
+
+
+def _release_cause(rec: Dict[str, Any], body: str):
+    """Q.850 cause from the Reason header, else X-Asterisk-HangupCauseCode."""
+    reason = REASON_RE.search(body)
+    cause  = REASON_CAUSE_RE.search(reason.group(1)) if reason else None
+    code   = cause.group(1) if cause else None
+    if code is None:
+        hup = HANGUP_CODE_RE.search(body)
+        code = hup.group(1) if hup else None
+    if code is None: return
+    rec['cause_code'] = code
+    rec['cause_text'] = Q850_CAUSES.get(code) or (cause.group(2) if cause and cause.group(2) else 'Unknown cause')
+
+
+def _finish(rec: Dict[str, Any], status: str = None) -> Dict[str, Any]:
+    if status: rec['status'] = status
+    rec['ring_ms']   = _ms(rec['setup_ts'], rec['ring_ts'])
+    rec['answer_ms'] = _ms(rec['setup_ts'], rec['answer_ts'])
+    dur = _ms(rec['answer_ts'], rec['end_ts'])
+    rec['duration_s'] = round(dur / 1000, 3) if dur is not None else None
+    return rec
+
+
+def _new_record(call_id: str, ts: str, body: str, node: Optional[str]) -> Dict[str, Any]:
+    rec = dict.fromkeys(CDR_FIELDS)
+    from_m, to_m, imsi_m = FROM_RE.search(body), TO_RE.search(body), IMSI_URI_RE.search(body)
+    rec.update(call_id=call_id, setup_ts=ts, status='active', node=node,
+               caller=_normalize_number(from_m.group(1)) if from_m else None,
+               callee=_normalize_number(to_m.group(1)) if to_m else None,
+               caller_imsi=imsi_m.group(1) if imsi_m else None)
+    return rec
+
+
+def cdr_records(blocks: Iterable[Block], max_active: int = CDR_MAX_ACTIVE,
+                idle_s: int = CDR_IDLE_S) -> Iterator[Dict[str, Any]]:
+    """Run a per-Call-ID dialog state machine over ``blocks`` and yield finished CDRs.
+
+    A dialog opens on an initial INVITE and is emitted (and forgotten) on BYE
+    or on a final non-2xx answer to the INVITE. Dialogs idle for ``idle_s``
+    log-seconds, or the oldest beyond ``max_active``, are emitted as
+    'timeout'; whatever is still open at the end is emitted as 'incomplete'.
+    Memory is bounded by the number of concurrently open calls.
+    """
+    active: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    last_ts = None
+    for n, blk in enumerate(blocks, 1):
+        ts, module, body = blk
+        if n % SWEEP_EVERY == 0 and last_ts:
+            now = _epoch(last_ts)
+            while active and now is not None:
+                rec   = next(iter(active.values()))
+                start = _epoch(rec['_seen'])
+                if start is None or now - start <= idle_s: break
+                yield _finish(active.popitem(last=False)[1], 'timeout')
+
+        start = SIP_START_RE.search(body)
+        if not start: continue
+        cid = CALLID_RE.search(body)
+        if not cid: continue
+        call_id, line, last_ts = cid.group(1), start.group(0), ts
+        rec = active.get(call_id)
+
+        if not line.startswith('SIP/2.0'):
+            method = line.split(None, 1)[0]
+            if method == 'INVITE' and rec is None:
+                if TO_TAG_RE.search(body): continue          # re-INVITE of a dialog we never opened
+                rec = active[call_id] = _new_record(call_id, ts, body, blk.node)
+                if len(active) > max_active:
+                    yield _finish(active.popitem(last=False)[1], 'timeout')
+            if rec is None: continue
+            if method == 'BYE':
+                from_m = FROM_RE.search(body)
+                sender = _normalize_number(from_m.group(1)) if from_m else None
+                rec.update(end_ts=ts, status='answered' if rec['answer_ts'] else 'cancelled',
+                           release_side='caller' if sender and sender == rec['caller'] else 'callee')
+                rtp = RTP_RE.search(body)
+                if rtp:
+                    rec.update(rtp_ps=int(rtp.group(1)), rtp_pr=int(rtp.group(3)),
+                               rtp_pl=int(rtp.group(5)), rtp_ji=int(rtp.group(7)))
+                _release_cause(rec, body)
+                del active[call_id]
+                yield _finish(rec)
+                continue
+            if method == 'CANCEL':
+                rec['release_side'] = 'caller'
+        else:
+            if rec is None: continue
+            cseq = CSEQ_RE.search(body)
+            if not cseq or not cseq.group(1).upper().endswith('INVITE'): continue
+            code = int(line.split()[1])
+            if code < 180 or rec['answer_ts']:
+                pass                                         # 100 Trying, 2xx retransmits
+            elif code < 200:
+                rec['ring_ts'] = rec['ring_ts'] or ts
+            elif code < 300:
+                rec['answer_ts'], rec['final_code'] = ts, code
+                imsi_m = IMSI_URI_RE.search(body)
+                if imsi_m and imsi_m.group(1) != rec['caller_imsi']:
+                    rec['callee_imsi'] = imsi_m.group(1)
+                if 'v=0' in body:
+                    audio = [m for m in _sdp_media(body) if m['type'] == 'audio' and m['codecs']]
+                    if audio: rec['codec'] = audio[0]['codecs'][0]
+            else:
+                rec.update(end_ts=ts, final_code=code,
+                           status='cancelled' if code == 487 else 'failed',
+                           release_side=rec['release_side'] or ('network' if 500 <= code < 600 else 'callee'))
+                _release_cause(rec, body)
+                del active[call_id]
+                yield _finish(rec)
+                continue
+        rec['_seen'] = ts
+        active.move_to_end(call_id)
+
+    for rec in active.values():
+        yield _finish(rec, 'incomplete')
+
+
+def _public(rec: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: rec[k] for k in CDR_FIELDS}
+
+
+def ndjson_lines(records: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    for rec in records:
+        yield to_json(_public(rec)) + b"\n"
+
+
+def csv_lines(records: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    buf = io.StringIO()
+    w   = csv.writer(buf)
+    w.writerow(CDR_FIELDS)
+    for rec in records:
+        w.writerow(['' if v is None else v for v in _public(rec).values()])
+        if buf.tell() > 1 << 16:
+            yield buf.getvalue()
+            buf.seek(0); buf.truncate()
+    yield buf.getvalue()
+
+
+if __name__ == "__main__":
+    import argparse
+    from sources import iter_file_blocks
+    ap = argparse.ArgumentParser(description="Write one CDR per call from a YATE log.")
+    ap.add_argument("log")
+    ap.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    args = ap.parse_args()
+    with open(args.log, "rb") as fh:
+        records = cdr_records(iter_file_blocks(fh))
+        if args.format == "csv":
+            for chunk in csv_lines(records): sys.stdout.write(chunk)
+        else:
+            for line in ndjson_lines(records): sys.stdout.buffer.write(line)
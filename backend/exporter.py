@@ -1,10 +1,6 @@
 import csv, io
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.units import cm
 from models import AnalyzeResponse
+# ReportLab is imported inside the PDF path only — it dominates worker import time
 
 def to_csv(data: AnalyzeResponse) -> bytes:
     buf = io.StringIO(); w = csv.writer(buf)
@@ -33,6 +29,10 @@ def to_csv(data: AnalyzeResponse) -> bytes:
     return buf.getvalue().encode("utf-8")
 
 def to_pdf(data: AnalyzeResponse) -> bytes:
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    from reportlab.lib.units import cm
     buf = io.BytesIO()
     doc = SimpleDocTemplate(buf, pagesize=landscape(A4),
                             leftMargin=1*cm, rightMargin=1*cm,
@@ -76,6 +76,8 @@ def to_pdf(data: AnalyzeResponse) -> bytes:
     return buf.getvalue()
 
 def _tbl(data, col_widths=None):
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle
     t = Table(data, colWidths=col_widths, repeatRows=1)
     t.setStyle(TableStyle([
         ("BACKGROUND",(0,0),(-1,0),colors.HexColor("#1e3a5f")),
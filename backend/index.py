@@ -0,0 +1,292 @@
+"""Archive-wide inverted index over SIP_LOG_DIR: number / IMSI / Call-ID → file, byte ranges, time span.
+
+    python index.py            # index new and grown files once, then exit
+"""
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+from parser import FROM_RE, TO_RE, PAI_RE, IMSI_URI_RE, CALLID_RE, _normalize_number
+from sources import LOG_DIR
+
+INDEX_DB       = os.environ.get("SIP_INDEX_DB", os.path.join(tempfile.gettempdir(), "sip-index.sqlite"))
+INDEX_INTERVAL = int(os.environ.get("SIP_INDEX_INTERVAL", "300"))   # seconds between refreshes; 0 = manual
+RANGE_GAP      = 64 << 10       # hits closer than this share one byte range
+HEAD_BYTES     = 4096           # file head fingerprint, detects rotation/rewrite
+SWEEP_EVERY    = 5000           # blocks between flushes of closed ranges
+SEARCH_LIMIT   = 200            # files per search response
+TERM_KINDS     = ('number', 'imsi', 'call_id')
+
+CHUNK_HEAD_RE = re.compile(rb'\d{4}-\d{2}-\d{2}_\d{2}:\d{2}:\d{2}\.\d+')
+CHUNK_TS_RE   = re.compile(r'\d{4}-\d{2}-\d{2}_\d{2}:\d{2}:\d{2}\.\d+')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, size INTEGER, mtime REAL,
+    head TEXT, indexed_to INTEGER, first_ts TEXT, last_ts TEXT);
+CREATE TABLE IF NOT EXISTS postings (
+    kind TEXT NOT NULL, term TEXT NOT NULL, file_id INTEGER NOT NULL,
+    start INTEGER NOT NULL, "end" INTEGER NOT NULL, first_ts TEXT, last_ts TEXT,
+    PRIMARY KEY (kind, term, file_id, start)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_file ON postings (file_id, start);
+"""
+
+_refresh_lock = threading.Lock()
+log = logging.getLogger(__name__)
+# Files whose last indexing attempt failed (path → error), and the last refresh-level error;
+# reported by refresh() so /index/refresh shows what the background refresher hit
+failures: Dict[str, str] = {}
+last_error: Optional[str] = None
+
+
+def _connect() -> sqlite3.Connection:
+    db = sqlite3.connect(INDEX_DB, timeout=30)
+    db.execute("PRAGMA journal_mode=WAL")       # searches keep reading while a refresh writes
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(SCHEMA)
+    return db
+
+
+def _root() -> str:
+    if not LOG_DIR:
+        raise ValueError("Archive index disabled (SIP_LOG_DIR not set)")
+    return os.path.realpath(LOG_DIR)
+
+
+def _block_terms(text: str) -> set:
+    """(kind, term) pairs for one block, using the parser's own header patterns."""
+    terms = set()
+    for rx in (FROM_RE, TO_RE, PAI_RE):
+        for m in rx.finditer(text):
+            num = _normalize_number(m.group(1))
+            if num: terms.add(('number', num))
+    for m in IMSI_URI_RE.finditer(text):
+        terms.add(('imsi', m.group(1)))
+    for m in CALLID_RE.finditer(text):
+        terms.add(('call_id', m.group(1)))
+    return terms
+
+
+def _iter_chunks(fh: BinaryIO, offset: int, size: int) -> Iterator[Tuple[int, int, bytes]]:
+    """(start, end, raw) per timestamp-headed chunk of ``fh[offset:size]``."""
+    fh.seek(offset)
+    pos, start, buf = offset, offset, []
+    while pos < size:
+        raw = fh.readline()
+        if not raw: break
+        if buf and CHUNK_HEAD_RE.match(raw):
+            yield start, pos, b''.join(buf)
+            start, buf = pos, []
+        buf.append(raw)
+        pos += len(raw)
+    if buf:
+        yield start, pos, b''.join(buf)
+
+
+def _index_file(db: sqlite3.Connection, file_id: int, fh: BinaryIO,
+                offset: int, size: int) -> Tuple[int, Optional[str], Optional[str]]:
+    """Post the terms of ``fh[offset:size]``; returns (last chunk start, first ts, last ts).
+
+    Consecutive hits of a term are coalesced into one byte range while the
+    gap between them stays under RANGE_GAP, which keeps the index small and
+    the ranges cheap to re-read. The last chunk may still be growing, so the
+    next refresh resumes from its start.
+    """
+    open_ranges: Dict[tuple, list] = {}
+    first_ts = last_ts = None
+    last_start = offset
+
+    def flush(keys):
+        db.executemany('INSERT OR REPLACE INTO postings VALUES (?,?,?,?,?,?,?)',
+                       [(k[0], k[1], file_id, *open_ranges.pop(k)) for k in keys])
+
+    for n, (start, end, raw) in enumerate(_iter_chunks(fh, offset, size), 1):
+        text = raw.decode("utf-8", errors="replace")
+        ts_m = CHUNK_TS_RE.match(text)
+        ts   = ts_m.group(0) if ts_m else last_ts
+        first_ts, last_ts, last_start = first_ts or ts, ts or last_ts, start
+        for key in _block_terms(text):
+            rng = open_ranges.get(key)
+            if rng and start - rng[1] <= RANGE_GAP:
+                rng[1], rng[3] = end, ts or rng[3]
+            else:
+                if rng: flush([key])
+                open_ranges[key] = [start, end, ts, ts]
+        if n % SWEEP_EVERY == 0:
+            flush([k for k, r in open_ranges.items() if start - r[1] > RANGE_GAP])
+    flush(list(open_ranges))
+    return last_start, first_ts, last_ts
+
+
+def _file_head(fh: BinaryIO) -> str:
+    fh.seek(0)
+    return hashlib.blake2b(fh.read(HEAD_BYTES), digest_size=16).hexdigest()
+
+
+def refresh() -> Dict[str, Any]:
+    """Bring the index up to date with LOG_DIR.
+
+    New files are indexed whole; files that only grew are indexed from where
+    the previous refresh stopped; rewritten or rotated files (different head,
+    or shorter than before) are re-indexed; vanished files are dropped. The
+    stats include per-file ``failures`` still outstanding and the error that
+    aborted the previous refresh, if any (``previous_error``).
+    """
+    global last_error
+    root = _root()
+    stats = {'indexed': 0, 'appended': 0, 'unchanged': 0, 'removed': 0, 'bytes': 0, 'failed': 0,
+             'previous_error': last_error}
+    t0 = time.perf_counter()
+    with _refresh_lock:
+        db = _connect()
+        try:
+            known = {row[1]: row for row in db.execute('SELECT * FROM files')}
+            seen  = set()
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+                for name in sorted(filenames):
+                    if name.startswith('.'): continue
+                    full = os.path.join(dirpath, name)
+                    rel  = os.path.relpath(full, root)
+                    seen.add(rel)
+                    _refresh_file(db, full, rel, known.get(rel), stats)
+            for rel in set(known) - seen:
+                db.execute('DELETE FROM postings WHERE file_id = ?', (known[rel][0],))
+                db.execute('DELETE FROM files WHERE id = ?', (known[rel][0],))
+                stats['removed'] += 1
+            for rel in set(failures) - seen:
+                del failures[rel]
+            db.commit()
+        except Exception as e:
+            last_error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            db.close()
+        last_error = None
+    stats['ms'] = round((time.perf_counter() - t0) * 1000, 1)
+    stats['failures'] = dict(failures)
+    return stats
+
+
+def _refresh_file(db: sqlite3.Connection, full: str, rel: str, row, stats: Dict[str, Any]):
+    """Index one file; a failure is logged, rolled back and recorded in ``failures``."""
+    try:
+        _index_one(db, full, rel, row, stats)
+        failures.pop(rel, None)
+    except (OSError, sqlite3.Error) as e:
+        db.rollback()
+        failures[rel] = f"{type(e).__name__}: {e}"
+        stats['failed'] += 1
+        log.warning("archive index: %s failed: %s", rel, failures[rel])
+
+
+def _index_one(db: sqlite3.Connection, full: str, rel: str, row, stats: Dict[str, Any]):
+    st = os.stat(full)
+    with open(full, "rb") as fh:
+        head = _file_head(fh)
+        if row and row[2] == st.st_size and row[3] == st.st_mtime and row[4] == head:
+            stats['unchanged'] += 1
+            return
+        if row and row[4] == head and st.st_size >= row[5]:
+            file_id, offset, first_ts = row[0], row[5], row[6]
+            db.execute('DELETE FROM postings WHERE file_id = ? AND start >= ?', (file_id, offset))
+            db.execute('UPDATE postings SET "end" = ? WHERE file_id = ? AND "end" > ?',
+                       (offset, file_id, offset))
+            stats['appended'] += 1
+        else:
+            if row:
+                db.execute('DELETE FROM postings WHERE file_id = ?', (row[0],))
+            file_id = row[0] if row else db.execute(
+                'INSERT INTO files (path) VALUES (?)', (rel,)).lastrowid
+            offset, first_ts = 0, None
+            stats['indexed'] += 1
+        last_start, first, last = _index_file(db, file_id, fh, offset, st.st_size)
+        db.execute('UPDATE files SET size=?, mtime=?, head=?, indexed_to=?, '
+                   'first_ts=?, last_ts=COALESCE(?, last_ts) WHERE id=?',
+                   (st.st_size, st.st_mtime, head, last_start, first_ts or first, last, file_id))
+        db.commit()
+        stats['bytes'] += st.st_size - offset
+
+
+def _query_terms(q: str, kind: Optional[str] = None) -> List[Tuple[str, str]]:
+    """What a search string can mean: digits are numbers (and IMSIs), anything else a Call-ID."""
+    q = q.strip()
+    if kind and kind not in TERM_KINDS:
+        raise ValueError(f"Unknown term kind: {kind}")
+    digits = q.lstrip('+')
+    if kind == 'call_id' or not digits.isdigit():
+        return [('call_id', q)]
+    terms = []
+    if kind in (None, 'number'): terms.append(('number', _normalize_number(digits)))
+    if kind == 'imsi' or (kind is None and len(digits) == 15): terms.append(('imsi', digits))
+    return terms
+
+
+def _merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def search(q: str, kind: Optional[str] = None, since: Optional[str] = None,
+           until: Optional[str] = None, limit: int = SEARCH_LIMIT) -> Dict[str, Any]:
+    """Files (with byte ranges and time span) in which ``q`` appears.
+
+    ``since``/``until`` use the log timestamp format and keep only ranges
+    overlapping that window. ``sources`` in the result can be passed as-is to
+    /analyze or /jobs.
+    """
+    _root()
+    t0    = time.perf_counter()
+    terms = _query_terms(q, kind)
+    sql   = ('SELECT f.path, p.start, p."end", p.first_ts, p.last_ts FROM postings p '
+             'JOIN files f ON f.id = p.file_id WHERE p.kind = ? AND p.term = ?')
+    extra = []
+    if since: sql += ' AND p.last_ts >= ?';  extra.append(since)
+    if until: sql += ' AND p.first_ts <= ?'; extra.append(until)
+    files: Dict[str, Dict[str, Any]] = {}
+    db = _connect()
+    try:
+        for term in terms:
+            for path, start, end, first, last in db.execute(sql, (*term, *extra)):
+                hit = files.setdefault(path, {'path': path, 'first_ts': first, 'last_ts': last,
+                                              'ranges': []})
+                hit['ranges'].append((start, end))
+                if first and (not hit['first_ts'] or first < hit['first_ts']): hit['first_ts'] = first
+                if last and (not hit['last_ts'] or last > hit['last_ts']):     hit['last_ts'] = last
+    finally:
+        db.close()
+    hits = sorted(files.values(), key=lambda h: (h['first_ts'] or '', h['path']))
+    for hit in hits:
+        hit['ranges'] = _merge_ranges(hit['ranges'])
+        hit['bytes']  = sum(e - s for s, e in hit['ranges'])
+    hits = hits[:limit]
+    return {
+        'query':      q,
+        'terms':      [f"{k}:{t}" for k, t in terms],
+        'hits':       hits,
+        'sources':    [{'path': h['path'], 'ranges': h['ranges']} for h in hits],
+        'elapsed_ms': round((time.perf_counter() - t0) * 1000, 2),
+    }
+
+
+def refresh_forever(stop: threading.Event, interval: int = INDEX_INTERVAL):
+    """Background refresher started by the app when SIP_LOG_DIR is set."""
+    while not stop.is_set():
+        try: refresh()
+        except Exception:                        # keep refreshing; refresh() records last_error
+            log.exception("archive index refresh failed")
+        stop.wait(interval)
+
+
+if __name__ == "__main__":
+    print(refresh())
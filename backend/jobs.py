@@ -0,0 +1,99 @@
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+from store import ResultStore
+
+JOB_WORKERS = int(os.environ.get("SIP_JOB_WORKERS", "2"))
+JOB_MAX     = int(os.environ.get("SIP_JOB_MAX", "64"))
+JOB_TTL     = int(os.environ.get("SIP_JOB_TTL", "3600"))
+
+
+class Progress:
+    """Counters advanced by the block extractor while a job tokenizes its input (UTF-8 bytes)."""
+    def __init__(self, bytes_total: int = 0):
+        self.bytes_total = bytes_total
+        self.bytes_read  = 0
+        self.blocks      = 0
+
+    def advance(self, nbytes: int, nblocks: int):
+        self.bytes_read += nbytes
+        self.blocks     += nblocks
+
+    def snapshot(self) -> Dict[str, Any]:
+        fraction = min(self.bytes_read / self.bytes_total, 1.0) if self.bytes_total else None
+        return {'bytes_read': self.bytes_read, 'bytes_total': self.bytes_total,
+                'blocks': self.blocks, 'fraction': fraction}
+
+
+class Job:
+    """One background analysis: queued → tokenizing → analyzing → done | failed."""
+    def __init__(self, bytes_total: int = 0):
+        self.id        = uuid.uuid4().hex
+        self.status    = 'queued'
+        self.progress  = Progress(bytes_total)
+        self.submitted = time.time()
+        self.started: Optional[float]  = None
+        self.finished: Optional[float] = None
+        self.error: Optional[str]      = None
+        self.result: Any               = None
+
+    def tokenized(self, blocks: Iterable) -> Iterator:
+        """Pass blocks through, switching to 'analyzing' once the input is exhausted."""
+        yield from blocks
+        self.status = 'analyzing'
+
+    def to_dict(self) -> Dict[str, Any]:
+        progress = self.progress.snapshot()
+        if self.status == 'done': progress['fraction'] = 1.0
+        return {
+            'job_id':      self.id,
+            'status':      self.status,
+            'progress':    progress,
+            'error':       self.error,
+            'analysis_id': self.result['analysis_id'] if self.result else None,
+            'submitted':   self.submitted,
+            'started':     self.started,
+            'finished':    self.finished,
+        }
+
+
+class JobQueue:
+    """Local worker pool, the queued/running jobs, and a TTL store of finished ones.
+
+    ``submit(run)`` schedules ``run(job)`` on a worker thread; whatever it
+    returns becomes ``job.result``. Unfinished jobs are pinned until they
+    finish; a finished job is evicted JOB_TTL seconds after it was last
+    polled (or when more than JOB_MAX have finished).
+    """
+    def __init__(self, workers: int = JOB_WORKERS, max_jobs: int = JOB_MAX, ttl: int = JOB_TTL):
+        self.pool    = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self.store   = ResultStore(max_jobs, ttl)
+        self.pending: Dict[str, Job] = {}
+
+    def submit(self, run: Callable[[Job], Any], bytes_total: int = 0,
+               cleanup: Optional[Callable[[], None]] = None) -> Job:
+        job = Job(bytes_total)
+        self.pending[job.id] = job
+        self.pool.submit(self._run, job, run, cleanup)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.pending.get(job_id) or self.store.get(job_id)
+
+    def _run(self, job: Job, run: Callable[[Job], Any], cleanup):
+        job.status, job.started = 'tokenizing', time.time()
+        try:
+            job.result = run(job)
+            job.status = 'done'
+        except Exception as e:
+            job.status, job.error = 'failed', str(e)
+        finally:
+            job.finished = time.time()
+            if cleanup: cleanup()
+            self.store.put(job, key=job.id)
+            self.pending.pop(job.id, None)
+
+
+jobs = JobQueue()
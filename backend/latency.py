@@ -0,0 +1,134 @@
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from rates import _epoch
+
+# Upper bucket edges (ms); the last bucket is open-ended
+EDGES_MS    = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 32000, 60000, 180000]
+MAX_PENDING = 50000          # open transactions kept for matching
+MAX_PEERS   = 256            # remote IPs tracked individually; the rest go to 'other'
+TIMER_B_S   = 32             # RFC 3261 64*T1 — unanswered transactions expire after this
+TIMER_C_S   = 180            # RFC 3261 Timer C — INVITEs with a provisional wait this long for a final
+
+
+class Histogram:
+    """Fixed-bucket latency histogram: constant memory, mergeable, percentiles by bucket."""
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(EDGES_MS) + 1)
+        self.count  = 0
+        self.total  = 0.0
+        self.min    = float('inf')
+        self.max    = 0.0
+
+    def add(self, ms: float):
+        i = 0
+        while i < len(EDGES_MS) and ms > EDGES_MS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count     += 1
+        self.total     += ms
+        self.min        = min(self.min, ms)
+        self.max        = max(self.max, ms)
+
+    def _quantile(self, q: float) -> float:
+        """Linear interpolation inside the bucket holding the q-th sample,
+        clamped to the observed min/max."""
+        rank, seen = q * self.count, 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                lo = EDGES_MS[i - 1] if i else 0
+                hi = EDGES_MS[i] if i < len(EDGES_MS) else self.max
+                return max(min(lo + (hi - lo) * (rank - seen) / c, self.max), self.min)
+            seen += c
+        return self.max
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            'count':   self.count,
+            'mean_ms': round(self.total / self.count, 1) if self.count else None,
+            'p50_ms':  round(self._quantile(0.50), 1),
+            'p90_ms':  round(self._quantile(0.90), 1),
+            'p99_ms':  round(self._quantile(0.99), 1),
+            'min_ms':  round(self.min, 1) if self.count else None,
+            'max_ms':  round(self.max, 1),
+            'buckets': self.counts,
+        }
+
+
+class TransactionEngine:
+    """Request → response latency per SIP transaction, in one streaming pass.
+
+    Requests open a transaction keyed by (node, top-Via branch, CSeq); the
+    first 100, first 18x and the final response are timed against the first
+    sighting of the request (retransmissions don't restart the clock).
+    Samples land in fixed-bucket histograms per "METHOD→class" series, both
+    overall and per remote peer. Open transactions are capped at MAX_PENDING
+    and expire after Timer B; INVITEs that got a provisional move to a
+    separate queue and expire Timer C after their last one. Both queues stay
+    in deadline order, so memory stays bounded on busy-hour captures.
+    """
+    def __init__(self):
+        self.pending: "OrderedDict[tuple, list]" = OrderedDict()
+        self.ringing: "OrderedDict[tuple, list]" = OrderedDict()
+        self.series:  Dict[str, Histogram] = {}
+        self.by_peer: Dict[str, Dict[str, Histogram]] = {}
+        self.expired = 0
+        self.unmatched = 0
+
+    def request(self, ts: str, node: Optional[str], branch: str, cseq: str, method: str,
+                peer: Optional[str]):
+        key = (node, branch, cseq)
+        if key in self.pending or key in self.ringing: return   # retransmission
+        t = _epoch(ts)
+        if t is None: return
+        self._expire(t)
+        self.pending[key] = [t, method, peer or '?', set(), t + TIMER_B_S]
+        if len(self.pending) + len(self.ringing) > MAX_PENDING:
+            (self.pending or self.ringing).popitem(last=False)
+            self.expired += 1
+
+    def response(self, ts: str, node: Optional[str], branch: str, cseq: str, code: int):
+        key = (node, branch, cseq)
+        txn = self.pending.get(key) or self.ringing.get(key)
+        if txn is None:
+            self.unmatched += 1
+            return
+        t0, method, peer, seen, _ = txn
+        cls = '100' if code == 100 else '18x' if 180 <= code < 190 else \
+              f"{code // 100}xx" if code >= 200 else None
+        t = _epoch(ts)
+        if cls and cls not in seen:
+            seen.add(cls)
+            if t is not None and t >= t0:
+                self._add(f"{method}→{cls}", peer, (t - t0) * 1000)
+        if code >= 200:
+            self.pending.pop(key, None) or self.ringing.pop(key)
+        elif method == 'INVITE' and t is not None:
+            self.pending.pop(key, None) or self.ringing.pop(key)
+            txn[4] = t + TIMER_C_S                       # Timer C (re)started by the provisional
+            self.ringing[key] = txn
+
+    def _add(self, name: str, peer: str, ms: float):
+        self.series.setdefault(name, Histogram()).add(ms)
+        if peer not in self.by_peer and len(self.by_peer) >= MAX_PEERS:
+            peer = 'other'
+        self.by_peer.setdefault(peer, {}).setdefault(name, Histogram()).add(ms)
+
+    def _expire(self, now: float):
+        for queue in (self.pending, self.ringing):
+            while queue:
+                if now <= next(iter(queue.values()))[4]: break
+                queue.popitem(last=False)
+                self.expired += 1
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            'edges_ms':  EDGES_MS,
+            'series':    {k: h.result() for k, h in sorted(self.series.items())},
+            'by_peer':   {p: {k: h.result() for k, h in sorted(s.items())}
+                          for p, s in sorted(self.by_peer.items())},
+            'open':      len(self.pending) + len(self.ringing),
+            'expired':   self.expired,
+            'unmatched': self.unmatched,
+        }
@@ -0,0 +1,164 @@
+import mmap
+import os
+import re
+from array import array
+from typing import List, Dict, Any
+from models import TimelineEvent
+from parser import TS_RE, SIP_START_RE, CALLID_RE
+
+LINE_TS_RE   = re.compile(r'\d{4}-\d{2}-\d{2}_\d{2}:\d{2}:\d{2}\.\d+')
+LINE_TS_B_RE = re.compile(LINE_TS_RE.pattern.encode())
+
+
+def _method_match(method: str, wanted: str) -> bool:
+    """'INVITE' matches INVITE, '180' matches '180 Ringing', 'ROUTE/FAIL' any failure."""
+    return method.upper().startswith(wanted.upper())
+
+
+def page_timeline(timeline: List[TimelineEvent], cursor: int = 0, limit: int = 500,
+                  method: str = None, call_id: str = None, since: str = None,
+                  until: str = None, regex: "re.Pattern" = None) -> Dict[str, Any]:
+    """Return up to ``limit`` events matching all filters, scanning from ``cursor``.
+
+    ``next_cursor`` is the index to resume from, or None at the end.
+    """
+    cid_key = f"Call-ID: {call_id[:30]}" if call_id else None
+    events  = []
+    i       = max(cursor, 0)
+    while i < len(timeline) and len(events) < limit:
+        ev = timeline[i]
+        i += 1
+        if since and ev.timestamp < since: continue
+        if until and ev.timestamp > until: continue
+        if method and not _method_match(ev.method, method): continue
+        if cid_key and cid_key not in ev.description: continue
+        if regex and not (regex.search(ev.method) or regex.search(ev.description)): continue
+        events.append(ev)
+    return {
+        'events':      events,
+        'next_cursor': i if i < len(timeline) else None,
+        'total':       len(timeline),
+    }
+
+
+def blocks_text(blocks) -> str:
+    """Raw-view text for merged blocks: one timestamped header per block, tagged with its node."""
+    parts = []
+    for blk in blocks:
+        ts, module, body = blk
+        node = f"[{blk.node}] " if getattr(blk, 'node', None) else ''
+        parts.append(f"{ts} <{module}> {node}{body}\n")
+    return ''.join(parts)
+
+
+class LogView:
+    """Line- and block-addressable view over a raw log kept server-side.
+
+    Line start offsets and the indexes of timestamped block-start lines are
+    computed once, so paging and searching never re-split the whole log.
+    """
+    def __init__(self, log: str):
+        self.log = log
+        self._index('\n', LINE_TS_RE)
+
+    def _index(self, nl, ts_re: "re.Pattern"):
+        log = self.log
+        self.starts = array('Q', [0])
+        self.blocks = array('Q')
+        pos = log.find(nl)
+        while pos != -1:
+            self.starts.append(pos + 1)
+            pos = log.find(nl, pos + 1)
+        self.end = len(log)
+        if self.end and log[-1:] == nl:
+            self.starts.pop()
+            self.end -= 1
+        for n, off in enumerate(self.starts):
+            if ts_re.match(log, off):
+                self.blocks.append(n)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _slice(self, start: int, end: int) -> str:
+        return self.log[start:end]
+
+    def line(self, n: int) -> str:
+        end = self.starts[n + 1] - 1 if n + 1 < len(self.starts) else self.end
+        return self._slice(self.starts[n], end).rstrip('\r')
+
+    def _block_span(self, n: int):
+        """(first, last + 1) line indexes of the block containing line ``n``."""
+        lo, hi = 0, len(self.blocks)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.blocks[mid] <= n: lo = mid + 1
+            else: hi = mid
+        first = self.blocks[lo - 1] if lo else 0
+        end   = self.blocks[lo] if lo < len(self.blocks) else len(self)
+        return first, end
+
+    def _block_matches(self, first: int, end: int, method, call_id, since, until) -> bool:
+        ts_m = TS_RE.match(self.line(first))
+        ts   = ts_m.group(1) if ts_m else ''
+        if (since or until) and not ts: return False
+        if since and ts < since: return False
+        if until and ts > until: return False
+        if not method and not call_id: return True
+        text = '\n'.join(self.line(k) for k in range(first, end))
+        if call_id:
+            cid = CALLID_RE.search(text)
+            if not cid or cid.group(1) != call_id: return False
+        if method:
+            sm = SIP_START_RE.search(text)
+            if not sm: return False
+            token = sm.group(0).split()[1 if sm.group(0).startswith('SIP/2.0') else 0]
+            if not _method_match(token, method): return False
+        return True
+
+    def search(self, start: int = 0, limit: int = 1000, q: str = None,
+               regex: "re.Pattern" = None, method: str = None, call_id: str = None,
+               since: str = None, until: str = None) -> Dict[str, Any]:
+        """Return up to ``limit`` lines from ``start`` matching all filters.
+
+        ``q``/``regex`` match single lines; ``method``, ``call_id`` and the
+        time window select whole blocks.
+        """
+        q_low      = q.lower() if q else None
+        block_flt  = method or call_id or since or until
+        lines: List[Dict[str, Any]] = []
+        n = max(start, 0)
+        while n < len(self) and len(lines) < limit:
+            if block_flt:
+                first, end = self._block_span(n)
+                if not self._block_matches(first, end, method, call_id, since, until):
+                    n = end
+                    continue
+            else:
+                end = len(self)
+            while n < end and len(lines) < limit:
+                text = self.line(n)
+                if (not q_low or q_low in text.lower()) and (not regex or regex.search(text)):
+                    lines.append({'n': n, 'text': text})
+                n += 1
+        return {
+            'lines': lines,
+            'next':  n if n < len(self) else None,
+            'total': len(self),
+        }
+
+
+class FileLogView(LogView):
+    """LogView over a log file, memory-mapped rather than read into a ``str``.
+
+    Offsets are bytes and lines are decoded only when read. The mapping
+    outlives the file name, so a spooled upload may be deleted afterwards.
+    """
+    def __init__(self, path: str):
+        with open(path, 'rb') as fh:
+            empty = not os.fstat(fh.fileno()).st_size
+            self.log = b'' if empty else mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self._index(b'\n', LINE_TS_B_RE)
+
+    def _slice(self, start: int, end: int) -> str:
+        return self.log[start:end].decode('utf-8', errors='replace')
@@ -1,23 +1,137 @@
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
-from typing import Optional
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic_core import to_json
+from contextlib import asynccontextmanager
+from typing import Optional, List
 import json
-from models import AnalyzeRequest, AnalyzeResponse
-from analyzer import analyze
+import re
+import shutil
+import tempfile
+import threading
+import os
+from models import AnalyzeRequest, AnalyzeResponse, TimelinePage, RawLogPage, JobStatus, SearchResponse
+from analyzer import analyze, cached_view, UnknownLogHash
+from sources import (merge_files, merge_sources, sources_size, sources_text, iter_text_blocks,
+                     iter_file_blocks, LOG_DIR)
 from exporter import to_csv, to_pdf
+from logview import LogView, FileLogView, page_timeline, blocks_text
+from store import analyses
+from warmup import warmup, WARMUP_ENABLED
+from jobs import jobs
+from cdr import cdr_records, ndjson_lines, csv_lines
+import index
 
-app = FastAPI(title="SIP Analyzer API", version="1.0.0")
+TIMELINE_PAGE = 500
+NDJSON_CHUNK  = 1000
+
+class ModelJSONResponse(Response):
+    """Dump already-validated models with pydantic-core's JSON encoder.
+
+    Returning a Response makes FastAPI skip response_model re-validation and
+    its generic jsonable_encoder walk; response_model stays for the schema.
+    """
+    media_type = "application/json"
+    def render(self, content) -> bytes:
+        return to_json(content)
+
+_PAGING_FIELDS = ('analysis_id', 'timeline_total', 'timeline_cursor', 'raw_lines')
+
+def _ndjson(resp: AnalyzeResponse):
+    """One JSON line per response section; the timeline in NDJSON_CHUNK slices."""
+    for name in AnalyzeResponse.model_fields:
+        if name in _PAGING_FIELDS: continue
+        value = getattr(resp, name)
+        if name == 'timeline':
+            for i in range(0, max(len(value), 1), NDJSON_CHUNK):
+                yield to_json({'section': name, 'offset': i, 'data': value[i:i + NDJSON_CHUNK]}) + b"\n"
+        else:
+            yield to_json({'section': name, 'data': value}) + b"\n"
+
+_warm: dict = {'ready': not WARMUP_ENABLED, 'warmup': None, 'error': None}
+
+def _run_warmup():
+    try: _warm['warmup'] = warmup()
+    except Exception as e: _warm['error'] = str(e)   # never keep a worker out of rotation
+    _warm['ready'] = True
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up (and keep the archive index fresh) in the background."""
+    if WARMUP_ENABLED:
+        threading.Thread(target=_run_warmup, name="warmup", daemon=True).start()
+    stop = threading.Event()
+    if LOG_DIR and index.INDEX_INTERVAL > 0:
+        threading.Thread(target=index.refresh_forever, args=(stop,), name="index", daemon=True).start()
+    yield
+    stop.set()
+
+app = FastAPI(title="SIP Analyzer API", version="1.0.0", lifespan=lifespan)
 app.add_middleware(CORSMiddleware, allow_origins=["*"],
                    allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
 @app.get("/health")
-def health(): return {"status": "ok"}
+def health():
+    if not _warm['ready']:
+        return ModelJSONResponse({"status": "warming"}, status_code=503)
+    return {"status": "ok", "warmup": _warm['warmup'], "warmup_error": _warm['error']}
+
+def _publish(req: AnalyzeRequest, resp: AnalyzeResponse, view: LogView = None) -> AnalyzeResponse:
+    """Keep the full result server-side and return only the first timeline page.
+
+    Source and +quick analyses get their raw view on the first raw-log
+    request (files are re-read, inline logs indexed then), so ``raw_lines``
+    is unknown until that point.
+    """
+    if view is None: view = cached_view(resp.log_hash)
+    if view is None:
+        if req.sources:
+            view = lambda: LogView(sources_text(req.sources))
+        elif resp.quick_look is not None:
+            view = lambda: cached_view(req.log_hash) or LogView(req.log)
+        else:
+            view = LogView(req.log)
+    aid  = analyses.put({'response': resp, 'log': view})
+    return resp.model_copy(update={
+        'timeline':        resp.timeline[:TIMELINE_PAGE],
+        'analysis_id':     aid,
+        'timeline_total':  len(resp.timeline),
+        'timeline_cursor': TIMELINE_PAGE if len(resp.timeline) > TIMELINE_PAGE else None,
+        'raw_lines':       len(view) if isinstance(view, LogView) else None,
+    })
+
+def _unknown_hash(e: UnknownLogHash):
+    return HTTPException(409, detail=f"Unknown or expired log_hash {e}; send the log again")
+
+def _stored(analysis_id: str):
+    entry = analyses.get(analysis_id)
+    if entry is None: raise HTTPException(404, detail="Unknown or expired analysis id")
+    return entry
+
+def _raw_view(entry) -> LogView:
+    if not isinstance(entry['log'], LogView): entry['log'] = entry['log']()
+    return entry['log']
+
+def _regex(pattern: Optional[str]):
+    if not pattern: return None
+    try: return re.compile(pattern, re.IGNORECASE)
+    except re.error as e: raise HTTPException(400, detail=f"Invalid regex: {e}")
 
 @app.post("/analyze", response_model=AnalyzeResponse)
 async def analyze_route(req: AnalyzeRequest):
-    try: return analyze(req)
+    try: return ModelJSONResponse(_publish(req, analyze(req)))
+    except UnknownLogHash as e: raise _unknown_hash(e)
+    except ValueError as e: raise HTTPException(400, detail=str(e))
+    except Exception as e: raise HTTPException(500, detail=str(e))
+
+@app.post("/analyze/stream")
+async def analyze_stream(req: AnalyzeRequest):
+    try: resp = analyze(req)
+    except UnknownLogHash as e: raise _unknown_hash(e)
+    except ValueError as e: raise HTTPException(400, detail=str(e))
     except Exception as e: raise HTTPException(500, detail=str(e))
+    return StreamingResponse(_ndjson(resp), media_type="application/x-ndjson")
 
 @app.post("/analyze/upload")
 async def analyze_upload(file: UploadFile = File(...),
@@ -28,14 +142,177 @@ async def analyze_upload(file: UploadFile = File(...),
         log_text = (await file.read()).decode("utf-8", errors="replace")
         req = AnalyzeRequest(caller=caller, callee=callee, caller_imsi=caller_imsi,
                              callee_imsi=callee_imsi, log=log_text, flags=json.loads(flags))
-        return analyze(req)
+        return ModelJSONResponse(_publish(req, analyze(req)))
+    except ValueError as e: raise HTTPException(400, detail=str(e))
+    except Exception as e: raise HTTPException(500, detail=str(e))
+
+@app.post("/analyze/upload-multi")
+async def analyze_upload_multi(files: List[UploadFile] = File(...),
+    nodes: Optional[str] = Form(None), offsets: Optional[str] = Form(None),
+    caller: Optional[str] = Form(None), callee: Optional[str] = Form(None),
+    caller_imsi: Optional[str] = Form(None), callee_imsi: Optional[str] = Form(None),
+    flags: Optional[str] = Form("[]")):
+    """Merge one log per node; ``nodes``/``offsets`` are JSON lists aligned with ``files``."""
+    try:
+        names = json.loads(nodes) if nodes else [f.filename for f in files]
+        req = AnalyzeRequest(caller=caller, callee=callee, caller_imsi=caller_imsi,
+                             callee_imsi=callee_imsi, flags=json.loads(flags))
+        blocks = list(merge_files([f.file for f in files], names,
+                                  json.loads(offsets) if offsets else None))
+        return ModelJSONResponse(_publish(req, analyze(req, blocks), LogView(blocks_text(blocks))))
+    except ValueError as e: raise HTTPException(400, detail=str(e))
     except Exception as e: raise HTTPException(500, detail=str(e))
 
+@app.get("/analysis/{analysis_id}/timeline", response_model=TimelinePage)
+def timeline_page(analysis_id: str, cursor: int = 0, limit: int = TIMELINE_PAGE,
+    method: Optional[str] = None, call_id: Optional[str] = None,
+    since: Optional[str] = None, until: Optional[str] = None, regex: Optional[str] = None):
+    entry = _stored(analysis_id)
+    return ModelJSONResponse(page_timeline(entry['response'].timeline, cursor, min(limit, 5000),
+                                           method, call_id, since, until, _regex(regex)))
+
+@app.get("/analysis/{analysis_id}/raw", response_model=RawLogPage)
+def raw_log_page(analysis_id: str, start: int = 0, limit: int = 1000,
+    q: Optional[str] = None, regex: Optional[str] = None,
+    method: Optional[str] = None, call_id: Optional[str] = None,
+    since: Optional[str] = None, until: Optional[str] = None):
+    entry = _stored(analysis_id)
+    return ModelJSONResponse(_raw_view(entry).search(start, min(limit, 10000), q, _regex(regex),
+                                                 method, call_id, since, until))
+
+# ── Archive search ─────────────────────────────────────────────────────────────
+
+@app.get("/search", response_model=SearchResponse)
+def search_route(q: str, kind: Optional[str] = None, since: Optional[str] = None,
+                 until: Optional[str] = None, limit: int = index.SEARCH_LIMIT):
+    """Which SIP_LOG_DIR files mention a number, IMSI or Call-ID; ``sources`` feeds /analyze or /jobs."""
+    try: return ModelJSONResponse(index.search(q, kind, since, until, min(limit, 1000)))
+    except ValueError as e: raise HTTPException(400, detail=str(e))
+
+@app.post("/index/refresh")
+def index_refresh():
+    """Index new and grown archive files now instead of waiting for the next interval."""
+    try: return index.refresh()
+    except ValueError as e: raise HTTPException(400, detail=str(e))
+
+# ── Background jobs ────────────────────────────────────────────────────────────
+
+def _submit(req: AnalyzeRequest, open_blocks, total: int, cleanup=None, view=None):
+    """Queue ``analyze`` over ``open_blocks(progress)`` and return the job status (202).
+
+    ``view()`` builds the raw log view before ``cleanup`` runs (e.g. from a
+    spooled upload); by default it comes from ``req`` as for /analyze.
+    """
+    def run(job):
+        resp = analyze(req, job.tokenized(open_blocks(job.progress)))
+        page = _publish(req, resp, view() if view else None)
+        return {'response': resp, 'published': page, 'analysis_id': page.analysis_id}
+    job = jobs.submit(run, total, cleanup)
+    return ModelJSONResponse(job.to_dict(), status_code=202)
+
+def _job(job_id: str, done: bool = False):
+    job = jobs.get(job_id)
+    if job is None: raise HTTPException(404, detail="Unknown or expired job id")
+    if done and job.status == 'failed': raise HTTPException(500, detail=job.error)
+    if done and job.status != 'done': raise HTTPException(409, detail=f"Job is {job.status}")
+    return job
+
+@app.post("/jobs", response_model=JobStatus, status_code=202)
+async def submit_job(req: AnalyzeRequest):
+    """Analyze ``log`` or ``sources`` (e.g. a single SIP_LOG_DIR path) in the background."""
+    try:
+        if req.sources:
+            total = sources_size(req.sources)
+            return _submit(req, lambda progress: merge_sources(req.sources, progress), total)
+        if req.log:
+            return _submit(req, lambda progress: iter_text_blocks(req.log, progress),
+                           len(req.log.encode()))
+    except ValueError as e: raise HTTPException(400, detail=str(e))
+    raise HTTPException(400, detail="No log provided")
+
+@app.post("/jobs/upload", response_model=JobStatus, status_code=202)
+async def submit_job_upload(file: UploadFile = File(...),
+    caller: Optional[str] = Form(None), callee: Optional[str] = Form(None),
+    caller_imsi: Optional[str] = Form(None), callee_imsi: Optional[str] = Form(None),
+    flags: Optional[str] = Form("[]")):
+    """Spool the upload to a temp file, then stream it through the job worker."""
+    req = AnalyzeRequest(caller=caller, callee=callee, caller_imsi=caller_imsi,
+                         callee_imsi=callee_imsi, flags=json.loads(flags))
+    with tempfile.NamedTemporaryFile(prefix="sipjob-", suffix=".log", delete=False) as tmp:
+        shutil.copyfileobj(file.file, tmp, 1 << 20)
+    def open_blocks(progress):
+        fh = open(tmp.name, "rb")
+        try: yield from iter_file_blocks(fh, progress)
+        finally: fh.close()
+    return _submit(req, open_blocks, os.path.getsize(tmp.name), lambda: os.unlink(tmp.name),
+                   lambda: FileLogView(tmp.name))
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+def job_status(job_id: str):
+    return ModelJSONResponse(_job(job_id).to_dict())
+
+@app.get("/jobs/{job_id}/result", response_model=AnalyzeResponse)
+def job_result(job_id: str):
+    """First timeline page plus analysis_id, exactly like POST /analyze."""
+    return ModelJSONResponse(_job(job_id, done=True).result['published'])
+
+@app.get("/jobs/{job_id}/export/{fmt}")
+def job_export(job_id: str, fmt: str):
+    resp = _job(job_id, done=True).result['response']
+    if fmt == "csv":
+        return Response(content=to_csv(resp), media_type="text/csv",
+                        headers={"Content-Disposition": "attachment; filename=sip_analysis.csv"})
+    if fmt == "pdf":
+        return Response(content=to_pdf(resp), media_type="application/pdf",
+                        headers={"Content-Disposition": "attachment; filename=sip_analysis.pdf"})
+    raise HTTPException(404, detail=f"Unknown export format: {fmt}")
+
+# ── Bulk CDRs ──────────────────────────────────────────────────────────────────
+
+CDR_FORMATS = ("ndjson", "csv")
+
+def _cdr_format(fmt: str) -> str:
+    if fmt not in CDR_FORMATS: raise HTTPException(400, detail=f"Unknown CDR format: {fmt}")
+    return fmt
+
+def _cdr_response(blocks, fmt: str, background: BackgroundTask = None):
+    records = cdr_records(blocks)
+    body = ndjson_lines(records) if fmt == "ndjson" else csv_lines(records)
+    if fmt == "csv":
+        return StreamingResponse(body, media_type="text/csv", background=background,
+                                 headers={"Content-Disposition": "attachment; filename=cdr.csv"})
+    return StreamingResponse(body, media_type="application/x-ndjson", background=background)
+
+@app.post("/cdr")
+async def cdr_stream(req: AnalyzeRequest, format: str = "ndjson"):
+    """One record per call over ``log`` or ``sources``, streamed as NDJSON or CSV."""
+    _cdr_format(format)
+    if req.sources:
+        # merge_sources opens files lazily, after the 200 has gone out — check paths now
+        try: sources_size(req.sources)
+        except ValueError as e: raise HTTPException(400, detail=str(e))
+        return _cdr_response(merge_sources(req.sources), format)
+    if not req.log: raise HTTPException(400, detail="No log provided")
+    return _cdr_response(iter_text_blocks(req.log), format)
+
+@app.post("/cdr/upload")
+async def cdr_upload(file: UploadFile = File(...), format: str = Form("ndjson")):
+    _cdr_format(format)
+    with tempfile.NamedTemporaryFile(prefix="sipcdr-", suffix=".log", delete=False) as tmp:
+        shutil.copyfileobj(file.file, tmp, 1 << 20)
+    def blocks():
+        with open(tmp.name, "rb") as fh:
+            yield from iter_file_blocks(fh)
+    # Runs after the response even if the client disconnects mid-stream
+    return _cdr_response(blocks(), format, BackgroundTask(os.unlink, tmp.name))
+
 @app.post("/export/csv")
 async def export_csv(req: AnalyzeRequest):
     try:
         return Response(content=to_csv(analyze(req)), media_type="text/csv",
                         headers={"Content-Disposition": "attachment; filename=sip_analysis.csv"})
+    except UnknownLogHash as e: raise _unknown_hash(e)
+    except ValueError as e: raise HTTPException(400, detail=str(e))
     except Exception as e: raise HTTPException(500, detail=str(e))
 
 @app.post("/export/pdf")
@@ -43,5 +320,7 @@ async def export_pdf(req: AnalyzeRequest):
     try:
         return Response(content=to_pdf(analyze(req)), media_type="application/pdf",
                         headers={"Content-Disposition": "attachment; filename=sip_analysis.pdf"})
+    except UnknownLogHash as e: raise _unknown_hash(e)
+    except ValueError as e: raise HTTPException(400, detail=str(e))
     except Exception as e: raise HTTPException(500, detail=str(e))
 
@@ -1,13 +1,23 @@
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
+
+class LogSource(BaseModel):
+    node: Optional[str] = None
+    log: Optional[str] = None
+    path: Optional[str] = None
+    ranges: Optional[List[Tuple[int, int]]] = None   # byte ranges of ``path`` to read (see /search)
+    clock_offset_ms: float = 0
 
 class AnalyzeRequest(BaseModel):
     caller: Optional[str] = None
     callee: Optional[str] = None
     caller_imsi: Optional[str] = None
     callee_imsi: Optional[str] = None
-    log: str
+    log: str = ""
+    log_hash: Optional[str] = None       # re-analyze a log sent earlier without re-uploading it
+    sources: Optional[List[LogSource]] = None
     flags: Optional[List[str]] = []
+    rate_step: Optional[int] = None
 
 class Participant(BaseModel):
     role: Optional[str] = "Unknown"
@@ -23,6 +33,7 @@ class TimelineEvent(BaseModel):
     description: str
     color: Optional[str] = ''
     raw: Optional[str] = None
+    node: Optional[str] = None
 
 class RTPStat(BaseModel):
     leg: str
@@ -48,11 +59,68 @@ class AnalyzeResponse(BaseModel):
     bye_info: Optional[ByeInfo] = None
     rtp_stats: List[RTPStat] = []
     anomalies: List[str] = []
+    anomaly_details: List[Dict[str, Any]] = []
     call_duration: Optional[str] = None
     answer_time: Optional[str] = None
     ring_time: Optional[str] = None
     sdp_info: Optional[dict] = None
     pgw_events: Optional[List[str]] = None
     data_usage: Optional[List[Dict]] = None
+    diameter_latency: Optional[Dict[str, Any]] = None
+    hop_latency: Optional[Dict[str, Any]] = None
+    transaction_latency: Optional[Dict[str, Any]] = None
+    quick_look: Optional[Dict[str, Any]] = None
     routing_info: Optional[List[str]] = None
+    routing_stats: Optional[Dict[str, Any]] = None
+    signaling_rates: Optional[Dict[str, Any]] = None
+    analysis_id: Optional[str] = None
+    log_hash: Optional[str] = None
+    timeline_total: Optional[int] = None
+    timeline_cursor: Optional[int] = None
+    raw_lines: Optional[int] = None
+
+class TimelinePage(BaseModel):
+    events: List[TimelineEvent] = []
+    next_cursor: Optional[int] = None
+    total: int = 0
+
+class RawLine(BaseModel):
+    n: int
+    text: str
+
+class RawLogPage(BaseModel):
+    lines: List[RawLine] = []
+    next: Optional[int] = None
+    total: int = 0
+
+
+class JobProgress(BaseModel):
+    bytes_read: int = 0
+    bytes_total: int = 0
+    blocks: int = 0
+    fraction: Optional[float] = None
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: str
+    progress: JobProgress
+    error: Optional[str] = None
+    analysis_id: Optional[str] = None
+    submitted: float
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+
+class SearchHit(BaseModel):
+    path: str
+    first_ts: Optional[str] = None
+    last_ts: Optional[str] = None
+    ranges: List[Tuple[int, int]] = []
+    bytes: int = 0
 
+class SearchResponse(BaseModel):
+    query: str
+    terms: List[str] = []
+    hits: List[SearchHit] = []
+    sources: List[LogSource] = []
+    elapsed_ms: float = 0
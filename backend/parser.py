@@ -1,6 +1,14 @@
 import re
-from typing import List, Dict, Any
+import heapq
+import itertools
+import hashlib
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import List, Dict, Any, Iterable, Iterator
 from models import TimelineEvent, Participant, RTPStat, ByeInfo
+from rates import RateEngine, _epoch
+from rules import RuleEngine, load_rules
+from latency import TransactionEngine
 
 # ── Core regex patterns ──────────────────────────────────────────────────────
 TS_RE         = re.compile(r'(\d{4}-\d{2}-\d{2}_\d{2}:\d{2}:\d{2}\.\d+)')
@@ -13,6 +21,8 @@ RTP_RE        = re.compile(
     r'P-RTP-Stat:\s*PS=?(\d+),OS=?(\d+),PR=?(\d+),OR=?(\d+),PL=?(\d+),PD=?(\d+),JI=?(\d+)',
     re.IGNORECASE
 )
+CODEC_CHANGE_RE = re.compile(r'[Ff]ormats?\s+(?:for\s+\S+\s+)?changed\s+to\s+[\'"]?([^\s\'"]+)[\'"]?')
+PGW_SESSION_RE  = re.compile(r'pgw/session/(create|delete).*?pgw_session["\s:]+([^,"}\s]+)', re.DOTALL)
 #CONTACT_IP_RE = re.compile(r'[Cc]ontact:\s*<?sip:[^@]+@([\d.]+):?(\d*)', re.MULTILINE)
 #PAI_RE        = re.compile(r'[Pp]-[Aa]sserted-[Ii]dentity:\s*<?(?:sip:|tel:)?\+?(\d+)', re.MULTILINE)
 FROM_RE = re.compile(
@@ -38,6 +48,25 @@ PAI_RE = re.compile(
 
 SIP_METHODS   = ['INVITE','BYE','CANCEL','REGISTER','PRACK','ACK',
                  'NOTIFY','OPTIONS','UPDATE','INFO','MESSAGE','SUBSCRIBE']
+# Request line or status line, wherever it sits in the block body
+SIP_START_RE  = re.compile(
+    r'^(?:(?:' + '|'.join(SIP_METHODS) + r')\s+\S+\s+SIP/2\.0|SIP/2\.0\s+\d{3}\b)[^\r\n]*',
+    re.MULTILINE
+)
+# Per-method request-line patterns, in SIP_METHODS priority order
+SIP_METHOD_RES = [(m, re.compile(rf'^{m}\s+', re.MULTILINE)) for m in SIP_METHODS]
+SIP_ANY_RE     = re.compile(r'^(?:(?:' + '|'.join(SIP_METHODS) + r')|SIP/2\.0)\s+', re.MULTILINE)
+SIP_STATUS_RE  = re.compile(r'^SIP/2\.0\s+(\d{3})\s+(.+)$', re.MULTILINE)
+BYE_LINE_RE    = re.compile(r'^BYE\s+', re.MULTILINE)
+YATE_RETURN_RE = re.compile(r"Returned\s+(?:true|false)\s+'([^']+)'")
+ROUTE_ERROR_RE = re.compile(r"param\['error'\]\s*=\s*'([^']+)'")
+IMSI_URI_RE    = re.compile(r'sip:(\d{15})@ims\.')
+RECV_FROM_RE   = re.compile(r"received \d+ bytes.*?from ([\d.]+):\d+")
+TRANSPORT_PEER_RE = re.compile(r"'(?:received|sending) \d+ bytes' (?:from|to) (\S+):\d+")
+CALLID_HDR_RE  = re.compile(r'[Cc]all-[Ii][Dd]:\s*(\S+)')
+CALLID_RE     = re.compile(r"(?:[Cc]all-[Ii][Dd]:\s*|param\['sip_callid'\]\s*=\s*')(\S+?)(?:'|\s|$)")
+CSEQ_RE       = re.compile(r'^CSeq:\s*(\d+\s+[A-Za-z]+)', re.MULTILINE | re.IGNORECASE)
+BRANCH_RE     = re.compile(r'branch=(z9hG4bK[^;\s,>]+)')
 DIAMETER_RE   = re.compile(
     r'\b(CCR|CCA|RAR|RAA|STR|STA|ASR|ASA|AAR|AAA|'
     r'DWR|DWA|DPR|DPA|UDR|UDA|PUR|PUA|SNR|SNA|PNR|PNA)\b',
@@ -60,41 +89,31 @@ DIAM_RESULT_KV_RE = re.compile(
     r"'diameter_result'\s*=\s*'([^']+)'",
     re.IGNORECASE
 )
-# <ResultCode> inside XML body (CCA top-level, NOT inside MultipleServicesCreditControl)
-# We only want the first one (top-level), not the per-service one
-DIAM_RESULT_CODE_RE = re.compile(
-    r'<ResultCode[^>]*>(\d+)</ResultCode>',
-    re.IGNORECASE
-)
-# Subscriber from XML (CCR and CCR embedded in xml= field)
-DIAM_IMSI_XML_RE = re.compile(
-    r'<SubscriptionIdType>imsi</SubscriptionIdType>\s*'
-    r'<SubscriptionIdData>(\d+)</SubscriptionIdData>',
-    re.IGNORECASE
-)
-DIAM_E164_XML_RE = re.compile(
-    r'<SubscriptionIdType>e164</SubscriptionIdType>\s*'
-    r'<SubscriptionIdData>(\d+)</SubscriptionIdData>',
-    re.IGNORECASE
-)
-# Correlation key between CCR and CCA
-DIAM_EEIDENT_RE = re.compile(r'\beeident="(\d+)"', re.IGNORECASE)
-
-# Request type
-DIAM_REQTYPE_RE = re.compile(
-    r'<CcRequestType[^>]*>(\w+)</CcRequestType>',
-    re.IGNORECASE
-)
-# Service context
-DIAM_SVC_RE = re.compile(
-    r'<ServiceContextId>(\d+)@',
-    re.IGNORECASE
-)
-# APN
-DIAM_APN_RE = re.compile(
-    r'<CalledStationId>([^<]+)</CalledStationId>',
-    re.IGNORECASE
-)
+# Correlation key between request and answer (root-tag attribute or kv dump)
+DIAM_EEIDENT_RE = re.compile(r"(?:\beeident=\"|'eeident'\s*=\s*')(\d+)", re.IGNORECASE)
+
+def _diam_tag(name: str, value: str) -> str:
+    """Pattern for ``<name ...>value</name>`` that also matches the tag-stripped
+    ``namevaluename`` form some YATE dumps produce."""
+    return rf'{name}(?:\s[^>]*)?>?\s*{value}\s*<?/?{name}'
+
+# Tag/value fields — <ResultCode> etc. match the first (top-level) occurrence,
+# NOT the per-service one inside MultipleServicesCreditControl
+DIAM_TAGGED_RE = {
+    'imsi':    re.compile(r'SubscriptionIdType>?\s*imsi\s*<?/?SubscriptionIdType>?\s*<?SubscriptionIdData>?\s*(\d+)', re.IGNORECASE),
+    'msisdn':  re.compile(r'SubscriptionIdType>?\s*e164\s*<?/?SubscriptionIdType>?\s*<?SubscriptionIdData>?\s*(\d+)', re.IGNORECASE),
+    'apn':     re.compile(_diam_tag('CalledStationId', r'([a-zA-Z0-9._-]+)')),
+    'ip':      re.compile(r'PDPAddress[^>]*?>?\s*([\d.]+)\s*<?/?PDPAddress'),
+    'reqtype': re.compile(_diam_tag('CcRequestType', r'(\w+)')),
+    'svc':     re.compile(r'ServiceContextId>?\s*(\d+)@'),
+    'result':  re.compile(_diam_tag('ResultCode', r'(\d+)')),
+}
+DIAM_SESSION_RE  = re.compile(r'SessionId[^>]*?>?\s*([\w.;:@-]*\d{6,}[\w.;:@-]*)', re.IGNORECASE)
+SESSION_SUFFIX_RE = re.compile(r'SessionId$', re.IGNORECASE)
+DIAM_UNIT_RE     = re.compile(r'(Granted|Used)ServiceUnit>?(.*?)<?/?\1ServiceUnit', re.DOTALL)
+DIAM_OCTETS_RE   = {k: re.compile(_diam_tag(f'Cc{k}Octets', r'(\d+)')) for k in ('Input', 'Output', 'Total')}
+DIAM_CCTIME_RE   = re.compile(_diam_tag('CcTime', r'(\d+)'))
+DIAM_SVC_NAMES   = {'32251': 'data', '32276': 'voice/SMS', '32274': 'MMS'}
 
 # Result string → success/denied classification
 _DIAM_SUCCESS_PREFIXES = ('DIAMETER_SUCCESS', '2001', '2')
@@ -129,6 +148,19 @@ def _is_diam_success(result_str: str, result_code: str) -> bool:
 
 
 # ── Block splitter ───────────────────────────────────────────────────────────
+class Block(tuple):
+    """A log block that unpacks like the plain ``(ts, module, body)`` tuple.
+
+    ``repeat`` is the number of identical copies collapsed into this block
+    by ``_dedup_blocks`` (1 when the message was logged only once); ``node``
+    names the source log when several node logs are merged.
+    """
+    def __new__(cls, ts, module, body, repeat=1, node=None):
+        self = tuple.__new__(cls, (ts, module, body))
+        self.repeat = repeat
+        self.node   = node
+        return self
+
 BLOCK_RE = re.compile(
     r'(\d{4}-\d{2}-\d{2}_\d{2}:\d{2}:\d{2}\.\d+)\s+'
     r'(?:<([^>]+)>)?\s*'           # <module> is now optional
@@ -136,21 +168,63 @@ BLOCK_RE = re.compile(
     r'(?:-----\n)?(.*?)(?=\d{4}-\d{2}-\d{2}_\d{2}:\d{2}:\d{2}\.\d+\s+|\Z)',  # lookahead no longer requires <
     re.DOTALL
 )
-def _normalize(log: str) -> str:
-    """Insert newlines before SIP headers in compressed grep output."""
-    return re.sub(
+PROMPT_RE   = re.compile(r'^\[root@[^\n]*\n', re.MULTILINE)
+GREP_SEP_RE = re.compile(r'^\s*--\s*$', re.MULTILINE)
+HEADER_BREAK_RE = re.compile(
         r'((?:Via|From|To|Call-ID|CSeq|Contact|User-Agent|'
         r'P-RTP-Stat|P-Asserted-Identity|P-Access-Network-Info|'
         r'Allow|Content-Length|Content-Type|Reason|Route|'
         r'Supported|Require|Expires|Authorization|Security-Verify|'
-        r'Record-Route|Session-Expires|X-Asterisk):\s)',
-        r'\n\1', log
-    )
-
-def _extract_blocks(log: str):
-    # Strip shell prompt and grep '--' separators
-    log = re.sub(r'^\[root@[^\n]*\n', '', log, flags=re.MULTILINE)
-    log = re.sub(r'^\s*--\s*$', '', log, flags=re.MULTILINE)
+        r'Record-Route|Session-Expires|X-Asterisk):\s)'
+)
+def _normalize(log: str) -> str:
+    """Insert newlines before SIP headers in compressed grep output."""
+    return HEADER_BREAK_RE.sub(r'\n\1', log)
+
+# Block header line: timestamp, optional <module>, rest of the first line
+BLOCK_HEAD_RE = re.compile(
+    r'^(\d{4}-\d{2}-\d{2}_\d{2}:\d{2}:\d{2}\.\d+)\s+(?:<([^>]+)>)?\s*([^\n]*)\n?', re.MULTILINE
+)
+# Format detection on the first DETECT_BYTES of a log
+DETECT_BYTES     = 8192
+HEAD_MODULE_RE   = re.compile(r'^\d{4}-\d{2}-\d{2}_\d{2}:\d{2}:\d{2}\.\d+\s+(<)?', re.MULTILINE)
+INLINE_HEADER_RE = re.compile(r'(?<=[^\n])(?<![\w-])(?:Call-ID|CSeq|Via):\s')
+LOG_FORMATS      = ('yate', 'engine', 'mixed', 'grep')
+
+def detect_format(sample: str) -> str:
+    """Classify a log from its first few KB.
+
+    'yate'   — every block header has a <module>, headers one per line
+    'engine' — block headers without <module> (engine/Format-B output)
+    'mixed'  — both kinds of header
+    'grep'   — shell prompts, '--' separators or headers compressed onto one
+               line; the only format that needs the normalization passes
+    """
+    sample = sample[:DETECT_BYTES]
+    if PROMPT_RE.search(sample) or GREP_SEP_RE.search(sample) or INLINE_HEADER_RE.search(sample):
+        return 'grep'
+    kinds = {bool(m.group(1)) for m in HEAD_MODULE_RE.finditer(sample)}
+    if kinds == {True}:  return 'yate'
+    if kinds == {False}: return 'engine'
+    return 'mixed' if kinds else 'grep'
+
+def _split_blocks(log: str) -> List[Block]:
+    """Tokenizer for well-formed logs: slice between line-anchored block headers."""
+    blocks = []
+    heads  = list(BLOCK_HEAD_RE.finditer(log))
+    for i, m in enumerate(heads):
+        end   = heads[i + 1].start() if i + 1 < len(heads) else len(log)
+        rest  = log[m.end():end]
+        if rest.startswith('-----\n'): rest = rest[6:]
+        body  = (m.group(3).strip() + '\n' + rest.strip()).strip()
+        if body:
+            blocks.append(Block(m.group(1), m.group(2) or 'engine', body))
+    return blocks
+
+def _extract_grep(log: str) -> List[Block]:
+    """Tokenizer for grep output: strip prompts/separators, re-split headers."""
+    log = PROMPT_RE.sub('', log)
+    log = GREP_SEP_RE.sub('', log)
     log = _normalize(log)
     blocks = []
     for m in BLOCK_RE.finditer(log):
@@ -160,9 +234,142 @@ def _extract_blocks(log: str):
         rest   = (m.group(4) or '').strip()
         body   = (first + '\n' + rest).strip()
         if body:
-            blocks.append((ts, module, body))
+            blocks.append(Block(ts, module, body))
     return blocks
 
+def _extract_blocks(log: str, fmt: str = None) -> List[Block]:
+    """Tokenize ``log`` with the tokenizer for its (detected) format."""
+    fmt = fmt or detect_format(log)
+    return _extract_grep(log) if fmt == 'grep' else _split_blocks(log)
+
+LINE_TS_RE = re.compile(r'\d{4}-\d{2}-\d{2}_\d{2}:\d{2}:\d{2}\.\d+')
+TS_FMT     = "%Y-%m-%d_%H:%M:%S.%f"
+
+def _iter_blocks(lines: Iterable[str], progress=None) -> Iterator[Block]:
+    """Stream blocks from an iterable of log lines without joining the whole log.
+
+    Lines are buffered only until the next line that starts with a timestamp,
+    then that chunk goes through the regular ``_extract_blocks``. ``progress``
+    (optional) gets ``advance(bytes, blocks)`` after every chunk.
+    """
+    lines  = iter(lines)
+    sample, size = [], 0
+    for line in lines:                         # format is detected once, on the head
+        sample.append(line)
+        size += len(line)
+        if size >= DETECT_BYTES: break
+    fmt = detect_format(''.join(sample))
+
+    buf = []
+    for line in itertools.chain(sample, lines):
+        if buf and LINE_TS_RE.match(line):
+            yield from _extract_chunk(''.join(buf), fmt, progress)
+            buf = []
+        buf.append(line)
+    if buf:
+        yield from _extract_chunk(''.join(buf), fmt, progress)
+
+def _extract_chunk(chunk: str, fmt: str, progress=None) -> List[Block]:
+    blocks = _extract_blocks(chunk, fmt)
+    if progress is not None:
+        progress.advance(len(chunk.encode('utf-8', 'replace')), len(blocks))
+    return blocks
+
+def _shift_ts(ts: str, offset_ms: float) -> str:
+    try: return (datetime.strptime(ts, TS_FMT) + timedelta(milliseconds=offset_ms)).strftime(TS_FMT)
+    except ValueError: return ts
+
+def _tag_blocks(blocks: Iterable[Block], node: str = None, offset_ms: float = 0) -> Iterator[Block]:
+    """Attach the source node and apply a per-node clock offset."""
+    for ts, module, body in blocks:
+        yield Block(_shift_ts(ts, offset_ms) if offset_ms else ts, module, body, node=node)
+
+def _merge_blocks(streams: List[Iterable[Block]]) -> Iterator[Block]:
+    """k-way merge of per-node block streams by timestamp (heap, streaming)."""
+    return heapq.merge(*streams, key=lambda b: b[0])
+
+def _dedup_key(body: str, node: str = None):
+    """Digest identifying one SIP message copy, or None for non-SIP blocks."""
+    start = SIP_START_RE.search(body)
+    if not start: return None
+    cid  = CALLID_RE.search(body)
+    cseq = CSEQ_RE.search(body)
+    if not cid or not cseq: return None
+    br   = BRANCH_RE.search(body)
+    key  = '\x00'.join((
+        ' '.join(start.group(0).split()),
+        cid.group(1),
+        ' '.join(cseq.group(1).split()),
+        br.group(1) if br else '',
+        _direction(body),
+        node or '',
+    ))
+    return hashlib.blake2b(key.encode('utf-8', 'replace'), digest_size=16).digest()
+
+def _dedup_blocks(blocks):
+    """Collapse repeated copies of a SIP message into the first one.
+
+    Copies logged by several modules or resent as retransmissions share the
+    same start line, Call-ID, CSeq, branch and direction; they are dropped
+    and counted in ``Block.repeat`` of a copy of the block that is kept (the
+    input blocks may be shared through the parse cache and are not touched).
+    """
+    first_seen: Dict[bytes, int] = {}   # dedup key → index in unique
+    repeats:    Dict[int, int]   = {}   # index in unique → copies seen
+    unique = []
+    for blk in blocks:
+        key = _dedup_key(blk[2], blk.node)
+        if key is not None:
+            i = first_seen.get(key)
+            if i is not None:
+                repeats[i] = repeats.get(i, 1) + 1
+                continue
+            first_seen[key] = len(unique)
+        unique.append(blk)
+    for i, n in repeats.items():
+        ts, module, body = blk = unique[i]
+        unique[i] = Block(ts, module, body, n, blk.node)
+    return unique
+
+def _subscriber_terms(numbers: Iterable[str], imsis: Iterable[str]) -> List[str]:
+    """Substrings that identify a subscriber in raw block text.
+
+    Numbers are reduced to their last 9 digits so national and international
+    spellings of the same MSISDN both match; IMSIs are matched whole.
+    """
+    terms = {n[-9:] for n in numbers if n} | {i for i in imsis if i}
+    return sorted(terms)
+
+def _may_have_callid(body: str) -> bool:
+    """Cheap substring pre-check for CALLID_RE ("[Cc]all-[Ii][Dd]:" / "sip_callid")."""
+    return 'all-' in body or 'sip_callid' in body
+
+def _prefilter_blocks(blocks: Iterable[Block], terms: List[str]) -> List[Block]:
+    """Keep only blocks relevant to the given subscriber terms, before any parsing.
+
+    A block is kept when its raw text contains a term, when it belongs to a
+    Call-ID dialog in which some block contains a term, or when it has no
+    Call-ID at all (INTERNAL/engine and Diameter context). Matching is plain
+    substring search, so other subscribers' SIP traffic never reaches the
+    per-block regexes; blocks that miss the terms only run CALLID_RE when
+    they contain one of its literal anchors.
+    """
+    blocks = blocks if isinstance(blocks, list) else list(blocks)
+    if not terms: return blocks
+    hits    = [any(t in blk[2] for t in terms) for blk in blocks]
+    dialogs = set()
+    for blk, hit in zip(blocks, hits):
+        if hit:
+            cid = CALLID_RE.search(blk[2])
+            if cid: dialogs.add(cid.group(1))
+    kept = []
+    for blk, hit in zip(blocks, hits):
+        if not hit and _may_have_callid(blk[2]):
+            cid = CALLID_RE.search(blk[2])
+            if cid and cid.group(1) not in dialogs: continue
+        kept.append(blk)
+    return kept
+
 def _first_line(body: str) -> str:
     for line in body.splitlines():
         line = line.strip()
@@ -176,6 +383,7 @@ def _direction(body: str) -> str:
     if 'received' in first200: return 'IN'
     return '→'
 
+@lru_cache(maxsize=65536)
 def _normalize_number(num: str) -> str:
     """Normalize phone numbers to E.164 format without leading +."""
     num = num.lstrip('0')
@@ -184,9 +392,14 @@ def _normalize_number(num: str) -> str:
     return num
 
 
-def _parse_timeline(blocks) -> List[TimelineEvent]:
+def _parse_timeline(blocks, rates: RateEngine = None,
+                    diameter: Dict[int, Dict] = None,
+                    hops: Dict[int, str] = None) -> List[TimelineEvent]:
+    if diameter is None:
+        diameter = _parse_diameter(blocks)['messages']
     events = []
-    for ts, module, body in blocks:
+    for idx, blk in enumerate(blocks):
+        ts, module, body = blk
         first = _first_line(body)
 
         # ── Determine method ─────────────────────────────────────────────────
@@ -194,31 +407,30 @@ def _parse_timeline(blocks) -> List[TimelineEvent]:
         is_diameter = False
 
         # SIP request — search full body (method line is after '-----' separator)
-        for m in SIP_METHODS:
-            if re.search(rf'^{m}\s+', body, re.MULTILINE):
+        for m, m_re in SIP_METHOD_RES:
+            if m_re.search(body):
                 method = m
                 break
 
         # SIP response — same, search full body
         if method is None:
-            m2 = re.search(r'^SIP/2\.0\s+(\d{3})\s+(.+)$', body, re.MULTILINE)
+            m2 = SIP_STATUS_RE.search(body)
             if m2:
                 method = f"{m2.group(1)} {m2.group(2)[:30]}"
 
-                # Diameter — check first line and first 120 chars of body
-        if method is None:
-            dm = DIAMETER_RE.search(first) or DIAMETER_RE.search(body[:120])
-            if dm:
-                method      = dm.group(1)
-                is_diameter = True
+        # Diameter — classified once by _parse_diameter
+        diam = diameter.get(idx) if method is None else None
+        if diam:
+            method      = diam['kind']
+            is_diameter = True
 
         # YATE engine message (call.route, call.execute, etc.)
         if method is None:
-            yate_m = re.search(r"Returned\s+(?:true|false)\s+'([^']+)'", first)
+            yate_m = YATE_RETURN_RE.search(first)
             if yate_m:                          # ← nested inside, safe
                 msg = yate_m.group(1)
                 if 'call.route' in msg:
-                    err_m = re.search(r"param\['error'\]\s*=\s*'([^']+)'", body)
+                    err_m = ROUTE_ERROR_RE.search(body)
                     method = f"ROUTE/FAIL:{err_m.group(1)}" if err_m else 'ROUTE/OK'
                 else:
                     method = msg.upper().replace('.', '/')
@@ -235,51 +447,33 @@ def _parse_timeline(blocks) -> List[TimelineEvent]:
 
         # ── Build description ─────────────────────────────────────────────────
         desc_parts = []
+        diam_result = None
 
         if is_diameter:
             # ── 1. Result — attribute on root tag takes priority ──────────
-            result_str  = None
-            result_code = None
-
-            rm_attr = DIAM_RESULT_ATTR_RE.search(body)
-            rm_kv   = DIAM_RESULT_KV_RE.search(body)
-            if rm_attr:
-                result_str = rm_attr.group(1)
-            elif rm_kv:
-                result_str = rm_kv.group(1)
-
-            # Top-level <ResultCode> — first match only
-            rc_m = DIAM_RESULT_CODE_RE.search(body)
-            if rc_m:
-                result_code = rc_m.group(1)
-
-            desc_parts.append(_diam_result_fmt(result_str, result_code))
-
-            # ── 2. Subscriber — from XML body or embedded xml= field ──────
-            # The CCR always carries it; the CCA doesn't, so we also check
-            # the 'xml' key-value field which contains the linked CCR XML
-            imsi_m = DIAM_IMSI_XML_RE.search(body)
-            e164_m = DIAM_E164_XML_RE.search(body)
-
-            if e164_m:
-                desc_parts.append(f"MSISDN:+{e164_m.group(1)}")
-            if imsi_m:
-                desc_parts.append(f"IMSI:{imsi_m.group(1)}")
+            desc_parts.append(_diam_result_fmt(diam['result_str'], diam['result']))
+            diam_result = diam['result'] or diam['result_str']
+
+            # ── 2. Subscriber — CCAs inherit it from their paired CCR ─────
+            if diam['msisdn']:
+                desc_parts.append(f"MSISDN:+{diam['msisdn']}")
+            if diam['imsi']:
+                desc_parts.append(f"IMSI:{diam['imsi']}")
 
             # ── 3. Request type ───────────────────────────────────────────
-            rt_m = DIAM_REQTYPE_RE.search(body)
-            if rt_m:
-                desc_parts.append(f"type:{rt_m.group(1)}")
+            if diam['reqtype']:
+                desc_parts.append(f"type:{diam['reqtype']}")
 
             # ── 4. Service / APN ──────────────────────────────────────────
-            svc_m = DIAM_SVC_RE.search(body)
-            apn_m = DIAM_APN_RE.search(body)
-            if svc_m:
-                svc_map = {'32251': 'data', '32276': 'voice/SMS', '32274': 'MMS'}
-                desc_parts.append(f"svc:{svc_map.get(svc_m.group(1), svc_m.group(1))}")
-            if apn_m:
-                desc_parts.append(f"APN:{apn_m.group(1)}")
-    
+            if diam['svc']:
+                desc_parts.append(f"svc:{DIAM_SVC_NAMES.get(diam['svc'], diam['svc'])}")
+            if diam['apn']:
+                desc_parts.append(f"APN:{diam['apn']}")
+
+            # ── 5. Request → answer latency ───────────────────────────────
+            if 'latency_ms' in diam:
+                desc_parts.append(f"latency:{diam['latency_ms']:.1f}ms")
+
             # Fallback if nothing extracted
             if len(desc_parts) == 1 and desc_parts[0].startswith('?'):
                 desc_parts.append(body[:120].replace('\n', ' '))
@@ -294,9 +488,13 @@ def _parse_timeline(blocks) -> List[TimelineEvent]:
             if to_m:
                 tn = to_m.group(1)
                 desc_parts.append(f"To: {tn}" if len(tn) >= 15 else f"To: +{tn}")
-            cid = re.search(r"(?:[Cc]all-[Ii][Dd]:\s*|param\['sip_callid'\]\s*=\s*')(\S+?)(?:'|\s|$)", body)
+            cid = CALLID_RE.search(body)
             if cid:
                 desc_parts.append(f"Call-ID: {cid.group(1)[:30]}")
+            if blk.repeat > 1:
+                desc_parts.append(f"repeated {blk.repeat}x")
+            if hops and idx in hops:
+                desc_parts.append(hops[idx])
 
         desc = " | ".join(desc_parts) if desc_parts else first[:120]
 
@@ -308,23 +506,25 @@ def _parse_timeline(blocks) -> List[TimelineEvent]:
         else:
             color = ''
 
+        if rates is not None:
+            rates.add(ts, method, diam_result, 'Network down' in body, blk.repeat)
+
         events.append(TimelineEvent(
             timestamp=ts,
             direction=_direction(body),
             method=method,
             description=desc,
             color=color,
+            node=blk.node,
         ))
     return events
 
-def _parse_participants(blocks, log: str) -> List[Participant]:
+def _parse_participants(blocks) -> List[Participant]:
     seen: Dict[str, Dict] = {}
 
     for ts, module, body in blocks:
         # ← fix: search full body instead of first line
-        has_sip = any(re.search(rf'^{m}\s+', body, re.MULTILINE) for m in SIP_METHODS) \
-                  or re.search(r'^SIP/2\.0\s+', body, re.MULTILINE)
-        if not has_sip:
+        if not SIP_ANY_RE.search(body):
             continue
 
         ua_m      = UA_RE.search(body)
@@ -338,12 +538,12 @@ def _parse_participants(blocks, log: str) -> List[Participant]:
         ua     = None if (ua_raw and 'YATE' in ua_raw) else ua_raw
 
         # Extract IMSI from SIP URI (15-digit number before @ims.)
-        imsi_m = re.search(r'sip:(\d{15})@ims\.', body)
+        imsi_m = IMSI_URI_RE.search(body)
         imsi   = imsi_m.group(1) if imsi_m else None
 
         # Also try to get IP from transport line if Contact didn't have it
         if not ip:
-            tp_m = re.search(r"received \d+ bytes.*?from ([\d.]+):\d+", body)
+            tp_m = RECV_FROM_RE.search(body)
             if tp_m:
                 ip = tp_m.group(1)
 
@@ -367,17 +567,38 @@ def _parse_participants(blocks, log: str) -> List[Participant]:
 
     return [Participant(**p) for p in seen.values()]
 
-
-def _parse_rtp(blocks, log: str) -> List[RTPStat]:
+def _index_participants(participants: List[Participant]) -> Dict[str, Dict[str, Participant]]:
+    """Hash indexes over detected participants, built once per log.
+
+    ``by_number`` maps the normalized number to its participant; ``by_imsi``
+    maps an IMSI to the MSISDN participant it was seen with, falling back to
+    the IMSI-as-number entry when no MSISDN carried it; ``imsi_by_number`` is
+    the reverse MSISDN → IMSI direction.
+    """
+    by_number: Dict[str, Participant] = {}
+    by_imsi:   Dict[str, Participant] = {}
+    imsi_by_number: Dict[str, str]    = {}
+    for p in participants:
+        norm = (p.number or '').lstrip('+')
+        by_number.setdefault(norm, p)
+        if p.imsi and (p.imsi not in by_imsi or by_imsi[p.imsi].number == f"+{p.imsi}"):
+            by_imsi[p.imsi] = p
+        if p.imsi and norm != p.imsi:
+            imsi_by_number.setdefault(norm, p.imsi)
+    return {'by_number': by_number, 'by_imsi': by_imsi, 'imsi_by_number': imsi_by_number}
+
+
+def _parse_rtp(blocks) -> List[RTPStat]:
     stats     = []
     seen_keys = set()
 
     # Extract codec — strip trailing quotes/spaces
-    codec_m = re.search(
-        r'[Ff]ormats?\s+(?:for\s+\S+\s+)?changed\s+to\s+[\'"]?([^\s\'"]+)[\'"]?',
-        log
-    )
-    codec = codec_m.group(1).strip("' ") if codec_m else None
+    codec = None
+    for ts, module, body in blocks:
+        codec_m = CODEC_CHANGE_RE.search(body)
+        if codec_m:
+            codec = codec_m.group(1).strip("' ")
+            break
 
     # Collect ALL P-RTP-Stat occurrences with context
     all_rtp = []
@@ -421,216 +642,407 @@ def _parse_rtp(blocks, log: str) -> List[RTPStat]:
         ))
     return stats
 
-def _parse_anomalies(blocks, log: str) -> List[str]:
-    anomalies = []
-    invite_branches: Dict[str, int] = {}
-    branch_re = re.compile(r'branch=(z9hG4bK\S+)')
-
-    for ts, module, body in blocks:
-        first = _first_line(body)
-
-        if 'Network down' in body:
-            # Extract the IP that went down from Transport(...) line
-            ip_m = re.search(r'Transport\([^)]*?-([\d.]+:\d+)\)\s+Network down', body)
-            ip   = ip_m.group(1) if ip_m else '?'
-            anomalies.append(f"[{ts}] Transport Network down — peer {ip}")
-
-        if re.match(r'^SIP/2\.0 5\d\d', first):
-            anomalies.append(f"[{ts}] {first[:80]}")
-
-        if 'SSRC' in body and 'expecting' in body:
-            anomalies.append(f"[{ts}] RTCP SSRC mismatch")
+def _from_number(ts, module, body):
+    from_m = FROM_RE.search(body)
+    return _normalize_number(from_m.group(1)) if from_m else None
 
-        if 'quota' in body.lower() or 'rejected_initial' in body.lower():
-            # ... existing Diameter quota logic unchanged ...
-            pass
+def _start_line(ts, module, body):
+    start = SIP_START_RE.search(body)
+    return start.group(0) if start else None
 
-        if 'L_Cancel' in body:
-            # Extract subscriber number from param['number'] or From header
-            num_m  = re.search(r"param\['number'\]\s*=\s*'(\d+)'", body)
-            from_m = FROM_RE.search(body)
-            if num_m:
-                sub = num_m.group(1)
-            elif from_m:
-                sub = _normalize_number(from_m.group(1))
-            else:
-                sub = '?'
-            # Extract which transport connection it came in on
-            tp_m = re.search(r"'([^']*?:[\d.]+:\d+[^']*)'", body)
-            tp   = tp_m.group(1) if tp_m else module
-            anomalies.append(f"[{ts}] AuC L_Cancel (auth failure) — subscriber {sub} via {tp}")
+def _call_id(ts, module, body):
+    cid = CALLID_RE.search(body)
+    return cid.group(1) if cid else None
 
-        if first.startswith('INVITE'):
-            bm = branch_re.search(body)
-            if bm:
-                b = bm.group(1)
-                invite_branches[b] = invite_branches.get(b, 0) + 1
-
-    for b, count in invite_branches.items():
-        if count > 1:
-            anomalies.append(f"INVITE retransmitted {count}x for branch {b}")
-
-    return list(dict.fromkeys(anomalies))
+def _diameter_kind(body: str):
+    """Diameter command abbreviation (CCR, CCA, ...) of a block, or None."""
+    dm = DIAMETER_RE.search(_first_line(body)) or DIAMETER_RE.search(body[:120])
+    if dm: return dm.group(1).upper()
+    if 'CreditControl' in body:
+        return 'CCA' if 'CreditControlAnswer' in body else 'CCR'
+    return None
 
-def _parse_pgw(log: str) -> List[str]:
+def _diameter_pair(ts, module, body):
+    """(end-to-end id, is request) for Diameter messages, so answers reach their request."""
+    if 'ident' not in body and 'IDENT' not in body: return None   # DIAM_EEIDENT_RE is case-insensitive
+    ee = DIAM_EEIDENT_RE.search(body)
+    kind = _diameter_kind(body) if ee else None
+    return (ee.group(1), kind.endswith('R')) if kind else None
+
+# Compiled once at import; extra rule files come from SIP_ANOMALY_RULES
+ANOMALY_RULES = RuleEngine(load_rules(), builtins={
+    'from':       _from_number,
+    'module':     lambda ts, module, body: module,
+    'first_line': lambda ts, module, body: _first_line(body),
+    'start_line': _start_line,
+    'call_id':    _call_id,
+    'pair_key':   _diameter_pair,
+})
+
+def _parse_anomalies(blocks) -> List[Dict[str, Any]]:
+    """Rule-engine findings per block, then retransmissions from repeat counts."""
+    findings: List[Dict[str, Any]] = []
+    seen, paired = set(), {}
+    retransmits: Dict[tuple, int] = {}
+
+    for blk in blocks:
+        ts, module, body = blk
+        findings.extend(ANOMALY_RULES.scan(ts, module, body, seen, paired))
+
+        # Retransmissions were collapsed by _dedup_blocks — report their counts
+        if blk.repeat > 1:
+            start = SIP_START_RE.search(body)
+            bm    = BRANCH_RE.search(body)
+            if start and bm and not start.group(0).startswith('SIP/2.0'):
+                key = (start.group(0).split()[0], bm.group(1))
+                retransmits[key] = max(retransmits.get(key, 0), blk.repeat)
+
+    for (method, branch), count in retransmits.items():
+        findings.append({'rule': 'retransmission', 'severity': 'minor', 'ts': None, 'call_id': None,
+                         'message': f"{method} retransmitted {count}x for branch {branch}"})
+    return findings
+
+def _anomaly_lines(findings: List[Dict[str, Any]]) -> List[str]:
+    lines = [f"[{f['ts']}] {f['message']}" if f['ts'] else f['message'] for f in findings]
+    return list(dict.fromkeys(lines))
+
+def _parse_pgw(blocks) -> List[str]:
     events = []
-    pgw_re = re.compile(
-        r'(\d{4}-\d{2}-\d{2}_\d{2}:\d{2}:\d{2}\.\d+).*?'
-        r'pgw/session/(create|delete).*?pgw_session["\s:]+([^,"}\s]+)',
-        re.DOTALL
-    )
-    for m in pgw_re.finditer(log):
-        events.append(f"[{m.group(1)}] PGW session {m.group(2).upper()}: {m.group(3)}")
+    for ts, module, body in blocks:
+        if 'pgw/session/' not in body: continue
+        m = PGW_SESSION_RE.search(body)
+        if m:
+            events.append(f"[{ts}] PGW session {m.group(1).upper()}: {m.group(2)}")
     return events
 
+SDP_CTYPE_RE  = re.compile(r'^(?:Content-Type|c):\s*application/sdp', re.MULTILINE | re.IGNORECASE)
+SDP_LINE_RE   = re.compile(r'^([vocmat])=([^\r\n]*)', re.MULTILINE)
+SDP_DIRECTIONS = ('sendrecv', 'sendonly', 'recvonly', 'inactive')
+
+def _sdp_media(body: str) -> List[Dict[str, Any]]:
+    """m= sections with port, payloads, codecs, connection IP, ptime and direction."""
+    start = body.find('v=0')
+    session_ip, session_dir = None, 'sendrecv'
+    media: List[Dict[str, Any]] = []
+    for key, val in SDP_LINE_RE.findall(body, start):
+        cur = media[-1] if media else None
+        if key == 'm':
+            parts = val.split()
+            media.append({'type': parts[0] if parts else '?',
+                          'port': int(parts[1].split('/')[0]) if len(parts) > 1 and parts[1].split('/')[0].isdigit() else None,
+                          'proto': parts[2] if len(parts) > 2 else None,
+                          'payloads': parts[3:], 'codecs': [], 'ip': None,
+                          'ptime': None, 'direction': None})
+        elif key == 'c':
+            ip = val.split()[-1].split('/')[0] if val.split() else None
+            if cur: cur['ip'] = ip
+            else:   session_ip = ip
+        elif key == 'a':
+            name, _, arg = val.partition(':')
+            if name in SDP_DIRECTIONS:
+                if cur: cur['direction'] = name
+                else:   session_dir = name
+            elif cur and name == 'rtpmap':
+                codec = arg.split(None, 1)[1].split('/')[0] if ' ' in arg else None
+                if codec and codec not in cur['codecs']: cur['codecs'].append(codec)
+            elif cur and name == 'ptime':
+                cur['ptime'] = arg.strip()
+    for m in media:
+        m['ip']        = m['ip'] or session_ip
+        m['direction'] = m['direction'] or session_dir
+    return media
+
+def _one_way(media: List[Dict[str, Any]]) -> List[str]:
+    reasons = []
+    for m in media:
+        if m['type'] != 'audio': continue
+        if m['direction'] != 'sendrecv': reasons.append(m['direction'])
+        if m['port'] == 0:               reasons.append('port 0')
+        if m['ip'] in ('0.0.0.0', '::'): reasons.append(f"c={m['ip']}")
+    return reasons
+
 def _parse_sdp(blocks) -> Dict[str, Any]:
-    offered, answered = [], []
+    """Offer/answer per (Call-ID, CSeq) over every dialog, in one pass.
+
+    The first SDP of a transaction is the offer (the INVITE, or the 200 for a
+    late offer); the first SDP from the other side is its answer. Codec
+    mismatches and one-way media candidates are flagged when the answer
+    arrives. ``offered``/``answered`` keep the first two entries for the UI.
+    """
+    dialogs: Dict[tuple, Dict[str, Any]] = {}
+    mismatch, one_way = [], []
     for ts, module, body in blocks:
-        if 'v=0' not in body: continue
+        if 'application/sdp' not in body or not SDP_CTYPE_RE.search(body): continue
+        start = SIP_START_RE.search(body)
+        cid   = CALLID_RE.search(body)
+        cseq  = CSEQ_RE.search(body)
+        if not start or not cid: continue
+        is_response = start.group(0).startswith('SIP/2.0')
         ua_m   = UA_RE.search(body)
         ua_raw = ua_m.group(1).strip() if ua_m else 'unknown'
         # Label YATE proxy blocks clearly
         ua     = 'IMS Core (YATE)' if ua_raw and 'YATE' in ua_raw else ua_raw
-        codecs = re.findall(r'a=rtpmap:\d+\s+([^\r\n/]+)', body)
-        entry  = {'ua': ua, 'codecs': list(dict.fromkeys(codecs))}
-        first  = _first_line(body)
-        if first.startswith('INVITE') or re.match(r'^SIP/2\.0 18[03]', first):
-            offered.append(entry)
-        elif re.match(r'^SIP/2\.0 200', first):
-            answered.append(entry)
-    return {'offered': offered[:2], 'answered': answered[:2]}
-
-def _parse_data_usage(log: str) -> List[Dict]:
-    """Parse Diameter CCR termination messages to build per-session data usage."""
-    sessions = {}
-
-    # Match each timestamped block containing CreditControlRequest/Answer
-    block_re = re.compile(
-        r'(\d{4}-\d{2}-\d{2}_\d{2}:\d{2}:\d{2}\.\d+).*?'
-        r'(CreditControlRequest|CreditControlAnswer)(.*?)'
-        r'(?=\d{4}-\d{2}-\d{2}_\d{2}:\d{2}:\d{2}|\Z)',
-        re.DOTALL
-    )
-
-    for m in block_re.finditer(log):
-        ts   = m.group(1)
-        kind = m.group(2)
-        body = m.group(3)
-
-        # Extract session ID as unique key
-        sess_m = re.search(r'SessionId[^>]*?([a-z0-9.]+\d{10,}[a-z0-9.]*)', body, re.IGNORECASE)
+        media  = _sdp_media(body)
+        entry  = {'ua': ua, 'ts': ts, 'line': start.group(0)[:60],
+                  'codecs': list(dict.fromkeys(c for m in media for c in m['codecs'])),
+                  'media': media}
+
+        key = (cid.group(1), cseq.group(1).split()[0] if cseq else '')
+        dlg = dialogs.get(key)
+        if dlg is None:
+            dialogs[key] = {'call_id': key[0], 'cseq': key[1], 'offer': entry,
+                            'offer_is_response': is_response, 'answer': None}
+            continue
+        if dlg['answer'] is not None or is_response == dlg['offer_is_response']:
+            continue
+        dlg['answer'] = entry
+
+        offered  = {c.upper() for m in dlg['offer']['media'] if m['type'] == 'audio' for c in m['codecs']}
+        answered = {c.upper() for m in media if m['type'] == 'audio' for c in m['codecs']}
+        common   = (offered & answered) - {'TELEPHONE-EVENT'}
+        if offered and answered and not common:
+            mismatch.append(f"[{ts}] Call-ID {key[0]}: offered {', '.join(dlg['offer']['codecs'])}"
+                            f" / answered {', '.join(entry['codecs'])}")
+        reasons = _one_way(dlg['offer']['media']) + _one_way(media)
+        if reasons:
+            one_way.append(f"[{ts}] Call-ID {key[0]}: {', '.join(dict.fromkeys(reasons))}")
+
+    items = list(dialogs.values())
+    for d in items: d.pop('offer_is_response')
+    return {
+        'offered':        [{'ua': d['offer']['ua'], 'codecs': d['offer']['codecs']} for d in items[:2]],
+        'answered':       [{'ua': d['answer']['ua'], 'codecs': d['answer']['codecs']}
+                           for d in items if d['answer']][:2],
+        'dialogs':        items,
+        'codec_mismatch': mismatch,
+        'one_way_media':  one_way,
+    }
+
+def _fmt_bytes(n):
+    if n == 0: return '0 B'
+    for unit in ['B','KB','MB','GB']:
+        if n < 1024: return f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+def _units(text: str) -> Dict[str, int]:
+    octets = {k: sum(int(v) for v in r.findall(text)) for k, r in DIAM_OCTETS_RE.items()}
+    octets['Time'] = sum(int(v) for v in DIAM_CCTIME_RE.findall(text))
+    return octets
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    s = sorted(samples)
+    pick = lambda q: s[min(len(s) - 1, int(q * len(s)))]
+    return {
+        'count':   len(s),
+        'mean_ms': round(sum(s) / len(s), 1),
+        'p50_ms':  round(pick(0.50), 1),
+        'p90_ms':  round(pick(0.90), 1),
+        'p99_ms':  round(pick(0.99), 1),
+        'max_ms':  round(s[-1], 1),
+    }
+
+def _parse_diameter(blocks) -> Dict[str, Any]:
+    """Single pass over Diameter blocks.
+
+    Requests are paired with their answers through an eeident hash map, so
+    every answer gets the request's subscriber/type and a request→answer
+    latency. Credit-control sessions aggregate granted and used units.
+
+    Returns ``messages`` (block index → record, used by the timeline),
+    ``sessions`` (the data_usage list) and ``latency`` (per request type).
+    """
+    messages: Dict[int, Dict[str, Any]] = {}
+    pending:  Dict[str, Dict[str, Any]] = {}
+    latency:  Dict[str, List[float]]    = {}
+    sessions: Dict[str, Dict[str, Any]] = {}
+
+    for idx, (ts, module, body) in enumerate(blocks):
+        kind = _diameter_kind(body)
+        if kind is None: continue
+
+        rec = {'kind': kind, 'ts': ts}
+        for key, rx in DIAM_TAGGED_RE.items():
+            m = rx.search(body)
+            rec[key] = m.group(1) if m else None
+        attr_m = DIAM_RESULT_ATTR_RE.search(body) or DIAM_RESULT_KV_RE.search(body)
+        rec['result_str'] = attr_m.group(1) if attr_m else None
+        ee_m = DIAM_EEIDENT_RE.search(body)
+        rec['eeident'] = ee_m.group(1) if ee_m else None
+        messages[idx] = rec
+
+        # ── Request/answer correlation ─────────────────────────────────────
+        if rec['eeident']:
+            if kind.endswith('R'):
+                pending.setdefault(rec['eeident'], rec)
+            elif kind.endswith('A') and rec['eeident'] in pending:
+                req = pending.pop(rec['eeident'])
+                for key in ('imsi', 'msisdn', 'reqtype', 'svc', 'apn', 'ip'):
+                    if not rec[key]: rec[key] = req[key]
+                t_req, t_ans = _epoch(req['ts']), _epoch(ts)
+                if t_req is not None and t_ans is not None:
+                    rec['latency_ms'] = (t_ans - t_req) * 1000
+                    lkey = f"{req['kind']}:{req['reqtype']}" if req['reqtype'] else req['kind']
+                    latency.setdefault(lkey, []).append(rec['latency_ms'])
+
+        # ── Credit-control session usage ───────────────────────────────────
+        if kind not in ('CCR', 'CCA'): continue
+        sess_m = DIAM_SESSION_RE.search(body)
         if not sess_m: continue
-        sess_id = sess_m.group(1)
-
-        # Extract identifiers
-        imsi_m   = re.search(r'SubscriptionIdTypeimsiSubscriptionIdType\s*SubscriptionIdData(\d+)', body)
-        e164_m   = re.search(r'SubscriptionIdTypee164SubscriptionIdType\s*SubscriptionIdData(\d+)', body)
-        apn_m    = re.search(r'CalledStationId([a-zA-Z0-9._-]+)CalledStationId', body)
-        ip_m     = re.search(r'PDPAddress[^>]*?([\d.]+)PDPAddress', body)
-        reqtype_m= re.search(r'CcRequestType(\w+)CcRequestType', body)
-        svc_m    = re.search(r'ServiceContextId(\d+)@', body)
-
-        imsi    = imsi_m.group(1)    if imsi_m    else None
-        msisdn  = e164_m.group(1)    if e164_m    else None
-        apn     = apn_m.group(1)     if apn_m     else None
-        ip      = ip_m.group(1)      if ip_m      else None
-        reqtype = reqtype_m.group(1) if reqtype_m else None
-        svc_code= svc_m.group(1)     if svc_m     else None
-
-        svc_map = {'32251': 'data', '32276': 'voice/SMS', '32274': 'MMS'}
-        service = svc_map.get(svc_code, svc_code) if svc_code else None
-
-        # Init session record
-        if sess_id not in sessions:
-            sessions[sess_id] = {
-                'session_id': sess_id,
-                'imsi':       imsi,
-                'msisdn':     f"+{msisdn}" if msisdn else None,
-                'apn':        apn,
-                'ip':         ip,
-                'service':    service,
-                'start_ts':   ts,
-                'end_ts':     None,
-                'in_bytes':   0,
-                'out_bytes':  0,
-                'total_bytes':0,
-                'req_count':  0,
-                'status':     'active',
+        sess_id = SESSION_SUFFIX_RE.sub('', sess_m.group(1))
+        service = DIAM_SVC_NAMES.get(rec['svc'], rec['svc']) if rec['svc'] else None
+
+        sess = sessions.get(sess_id)
+        if sess is None:
+            sess = sessions[sess_id] = {
+                'session_id':   sess_id,
+                'imsi':         rec['imsi'],
+                'msisdn':       f"+{rec['msisdn']}" if rec['msisdn'] else None,
+                'apn':          rec['apn'],
+                'ip':           rec['ip'],
+                'service':      service,
+                'start_ts':     ts,
+                'end_ts':       None,
+                'in_bytes':     0,
+                'out_bytes':    0,
+                'total_bytes':  0,
+                'granted_bytes':0,
+                'req_count':    0,
+                'status':       'active',
             }
         else:
-            # Update fields if newly found
-            rec = sessions[sess_id]
-            if imsi   and not rec['imsi']:   rec['imsi']   = imsi
-            if msisdn and not rec['msisdn']: rec['msisdn'] = f"+{msisdn}"
-            if apn    and not rec['apn']:    rec['apn']    = apn
-            if ip     and not rec['ip']:     rec['ip']     = ip
-            if service and not rec['service']: rec['service'] = service
-
-        # Accumulate usage from UsedServiceUnit blocks
-        for in_b  in re.findall(r'CcInputOctets(\d+)CcInputOctets',  body):
-            sessions[sess_id]['in_bytes']  += int(in_b)
-        for out_b in re.findall(r'CcOutputOctets(\d+)CcOutputOctets', body):
-            sessions[sess_id]['out_bytes'] += int(out_b)
-        for tot_b in re.findall(r'CcTotalOctets(\d+)CcTotalOctets',   body):
-            sessions[sess_id]['total_bytes'] += int(tot_b)
-
-        # Also accumulate voice time
-        for cc_t in re.findall(r'CcTime(\d+)CcTime', body):
-            sessions[sess_id].setdefault('voice_sec', 0)
-            sessions[sess_id]['voice_sec'] += int(cc_t)
-
-        sessions[sess_id]['req_count'] += 1
-
-        # Mark termination
-        if reqtype in ('termination', 'terminate'):
-            sessions[sess_id]['end_ts']  = ts
-            sessions[sess_id]['status']  = 'terminated'
+            if rec['imsi']   and not sess['imsi']:    sess['imsi']    = rec['imsi']
+            if rec['msisdn'] and not sess['msisdn']:  sess['msisdn']  = f"+{rec['msisdn']}"
+            if rec['apn']    and not sess['apn']:     sess['apn']     = rec['apn']
+            if rec['ip']     and not sess['ip']:      sess['ip']      = rec['ip']
+            if service       and not sess['service']: sess['service'] = service
+
+        sections = DIAM_UNIT_RE.findall(body)
+        # Dumps without unit wrappers only ever carry used units
+        for unit, text in (sections or [('Used', body)]):
+            u = _units(text)
+            if unit == 'Used':
+                sess['in_bytes']    += u['Input']
+                sess['out_bytes']   += u['Output']
+                sess['total_bytes'] += u['Total']
+                if u['Time']: sess['voice_sec'] = sess.get('voice_sec', 0) + u['Time']
+            else:
+                sess['granted_bytes'] += u['Total'] or u['Input'] + u['Output']
+                if u['Time']: sess['granted_sec'] = sess.get('granted_sec', 0) + u['Time']
+
+        if kind == 'CCR':
+            sess['req_count'] += 1
+        elif rec['result_str'] or rec['result']:
+            sess['last_result'] = _diam_result_fmt(rec['result_str'], rec['result'])
+        if rec['reqtype'] in ('termination', 'terminate'):
+            sess['end_ts'] = ts
+            sess['status'] = 'terminated'
 
     # Deduplicate and clean up — remove 0-usage duplicates per IMSI/APN
-    result = []
-    seen   = set()
+    usage = []
+    seen  = set()
     for s in sessions.values():
         key = (s.get('imsi'), s.get('apn'), s.get('start_ts', '')[:16])
         if key in seen: continue
         seen.add(key)
-
-        # Format bytes human-readable
-        def fmt_bytes(n):
-            if n == 0: return '0 B'
-            for unit in ['B','KB','MB','GB']:
-                if n < 1024: return f"{n:.1f} {unit}"
-                n /= 1024
-            return f"{n:.1f} TB"
-
-        s['in_bytes_fmt']    = fmt_bytes(s['in_bytes'])
-        s['out_bytes_fmt']   = fmt_bytes(s['out_bytes'])
-        s['total_bytes_fmt'] = fmt_bytes(s['total_bytes'])
-        s['voice_sec_fmt']   = f"{s.get('voice_sec',0)}s" \
-                               if s.get('voice_sec') else None
-        result.append(s)
-
-    # Sort by start time
-    result.sort(key=lambda x: x.get('start_ts',''))
-    return result
-
+        s['in_bytes_fmt']      = _fmt_bytes(s['in_bytes'])
+        s['out_bytes_fmt']     = _fmt_bytes(s['out_bytes'])
+        s['total_bytes_fmt']   = _fmt_bytes(s['total_bytes'])
+        s['granted_bytes_fmt'] = _fmt_bytes(s['granted_bytes'])
+        s['voice_sec_fmt']     = f"{s['voice_sec']}s" if s.get('voice_sec') else None
+        usage.append(s)
+    usage.sort(key=lambda x: x.get('start_ts',''))
+
+    stats = {k: _percentiles(v) for k, v in sorted(latency.items())}
+    stats['unanswered'] = len(pending)
+    return {'messages': messages, 'sessions': usage, 'latency': stats}
+
+
+def _parse_hops(blocks) -> Dict[str, Any]:
+    """Per-hop latency when the same SIP message is logged by several nodes.
+
+    Messages are matched on method/status, Call-ID and CSeq; each sighting on
+    a new node is timed against the previous node that logged it. Returns
+    ``notes`` (block index → "hop a→b 3.2ms") and per node-pair ``stats``.
+    """
+    last:    Dict[tuple, tuple]       = {}
+    notes:   Dict[int, str]           = {}
+    samples: Dict[str, List[float]]   = {}
+    for idx, blk in enumerate(blocks):
+        if blk.node is None: continue
+        body  = blk[2]
+        start = SIP_START_RE.search(body)
+        cid   = CALLID_RE.search(body)
+        cseq  = CSEQ_RE.search(body)
+        if not (start and cid and cseq): continue
+        parts = start.group(0).split()
+        token = parts[1] if parts[0] == 'SIP/2.0' else parts[0]
+        key   = (token, cid.group(1), ' '.join(cseq.group(1).split()))
+        t     = _epoch(blk[0])
+        prev  = last.get(key)
+        if prev and prev[0] != blk.node and t is not None and prev[1] is not None:
+            ms   = (t - prev[1]) * 1000
+            pair = f"{prev[0]}→{blk.node}"
+            notes[idx] = f"hop {pair} {ms:.1f}ms"
+            samples.setdefault(pair, []).append(ms)
+        if not prev or prev[0] != blk.node:
+            last[key] = (blk.node, t)
+    return {'notes': notes, 'stats': {k: _percentiles(v) for k, v in sorted(samples.items())}}
+
+def _parse_transactions(blocks) -> Dict[str, Any]:
+    """Per-transaction request → 100/18x/final latency histograms (see TransactionEngine)."""
+    engine = TransactionEngine()
+    for blk in blocks:
+        body  = blk[2]
+        start = SIP_START_RE.search(body)
+        if not start: continue
+        bm    = BRANCH_RE.search(body)
+        cseq  = CSEQ_RE.search(body)
+        if not (bm and cseq): continue
+        line  = start.group(0)
+        key   = ' '.join(cseq.group(1).split()).upper()
+        if line.startswith('SIP/2.0'):
+            engine.response(blk[0], blk.node, bm.group(1), key, int(line.split()[1]))
+        else:
+            method = line.split(None, 1)[0]
+            if method == 'ACK': continue                 # never answered
+            peer = TRANSPORT_PEER_RE.search(body)
+            engine.request(blk[0], blk.node, bm.group(1), key, method,
+                           peer.group(1) if peer else None)
+    return engine.result()
 
 def parse_log(log: str) -> Dict[str, Any]:
-    blocks = _extract_blocks(log)
+    return parse_blocks(_extract_blocks(log))
+
+def parse_blocks(blocks: Iterable[Block]) -> Dict[str, Any]:
+    blocks = _dedup_blocks(blocks)
+    participants = _parse_participants(blocks)
+    rates  = RateEngine()
+    diameter = _parse_diameter(blocks)
+    hops   = _parse_hops(blocks)
+    findings = _parse_anomalies(blocks)
     return {
-        'timeline':     _parse_timeline(blocks),
-        'participants': _parse_participants(blocks, log),
-        'rtp_stats':    _parse_rtp(blocks, log),
-        'anomalies':    _parse_anomalies(blocks, log),
-        'pgw_events':   _parse_pgw(log),
+        'timeline':     _parse_timeline(blocks, rates, diameter['messages'], hops['notes']),
+        'rates':        rates.result(),
+        'participants': participants,
+        'participant_index': _index_participants(participants),
+        'rtp_stats':    _parse_rtp(blocks),
+        'anomalies':    _anomaly_lines(findings),
+        'anomaly_details': findings,
+        'pgw_events':   _parse_pgw(blocks),
         'sdp_info':     _parse_sdp(blocks),
-        'data_usage':   _parse_data_usage(log),
+        'data_usage':   diameter['sessions'],
+        'diameter_latency': diameter['latency'],
+        'hop_latency':  hops['stats'],
+        'transaction_latency': _parse_transactions(blocks),
         'bye_info':     _parse_bye(blocks),
         'raw_blocks':   blocks,
     }
+
 def _parse_bye(blocks) -> 'ByeInfo | None':
     for ts, module, body in blocks:
         # ← was: first = _first_line(body) + if not first.startswith('BYE')
-        if not re.search(r'^BYE\s+', body, re.MULTILINE):
+        if not BYE_LINE_RE.search(body):
             continue
 
         ua_m      = UA_RE.search(body)
@@ -648,7 +1060,7 @@ def _parse_bye(blocks) -> 'ByeInfo | None':
         rtp_m = RTP_RE.search(body)
         if rtp_m:
             evidence.append(f"P-RTP-Stat: PS={rtp_m.group(1)} PR={rtp_m.group(3)} PL={rtp_m.group(5)}")
-        cid = re.search(r'[Cc]all-[Ii][Dd]:\s*(\S+)', body)
+        cid = CALLID_HDR_RE.search(body)
         if cid:
             evidence.append(f"Call-ID: {cid.group(1)}")
 
@@ -0,0 +1,255 @@
+"""Approximate "quick look" over huge logs: parse a random sample of block-aligned windows.
+
+Reads a fixed byte budget regardless of log size, so the answer comes back
+in bounded time; counts are extrapolated with 95% confidence intervals and
+top numbers / peer IPs come from heavy-hitter sketches.
+"""
+import heapq
+import math
+import os
+import random
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from parser import (SIP_START_RE, FROM_RE, TO_RE, PAI_RE, TRANSPORT_PEER_RE, LINE_TS_RE,
+                    DIAM_RESULT_ATTR_RE, DIAM_RESULT_KV_RE, DIAM_TAGGED_RE, ANOMALY_RULES,
+                    _iter_blocks, _dedup_blocks, _normalize_number)
+from sources import resolve_path
+
+QUICK_BYTES   = int(os.environ.get("SIP_QUICK_BYTES", str(4 << 20)))   # total sample budget
+QUICK_WINDOWS = int(os.environ.get("SIP_QUICK_WINDOWS", "64"))         # windows per analysis
+SKETCH_K      = 200          # SpaceSaving counters per sketch
+TOP_N         = 10
+Z_95          = 1.96
+
+# Block timestamp prefix (as in BLOCK_RE), at the start of a line / of a buffer;
+# bytes patterns for files, str patterns for inline logs
+LINE_HEAD_RE = {bytes: re.compile(LINE_TS_RE.pattern.encode()), str: LINE_TS_RE}
+NEXT_HEAD_RE = {bytes: re.compile(rb'(?<=\n)' + LINE_TS_RE.pattern.encode()),
+                str:   re.compile(r'(?<=\n)' + LINE_TS_RE.pattern)}
+
+
+class SpaceSaving:
+    """Metwally et al. heavy-hitter sketch: ``k`` counters, count overestimated by at most ``error``."""
+    def __init__(self, k: int = SKETCH_K):
+        self.k = k
+        self.counts: Dict[str, list] = {}     # item → [count, error]
+        self.heap: List[Tuple[int, str]] = [] # one (count at push, item) per item, lazily refreshed
+
+    def add(self, item: str, n: int = 1):
+        c = self.counts.get(item)
+        if c is not None:
+            c[0] += n
+            return
+        low = 0
+        if len(self.counts) >= self.k:
+            while self.heap[0][0] != self.counts[self.heap[0][1]][0]:
+                _, stale = self.heap[0]
+                heapq.heapreplace(self.heap, (self.counts[stale][0], stale))
+            low, victim = heapq.heappop(self.heap)
+            del self.counts[victim]
+        self.counts[item] = [low + n, low]
+        heapq.heappush(self.heap, (low + n, item))
+
+    def top(self, n: int = TOP_N) -> List[Tuple[str, int, int]]:
+        return sorted(((i, c, e) for i, (c, e) in self.counts.items()), key=lambda t: -t[1])[:n]
+
+
+class _Text:
+    """Read-only file-like view of an inline log, so it is sampled in place
+    rather than encoded whole. Offsets are characters."""
+    def __init__(self, text: str):
+        self.text, self.pos = text, 0
+
+    def seek(self, pos: int): self.pos = pos
+    def tell(self) -> int:    return self.pos
+    def close(self):          pass
+
+    def read(self, n: int) -> str:
+        out = self.text[self.pos:self.pos + n]
+        self.pos += len(out)
+        return out
+
+    def readline(self) -> str:
+        nl = self.text.find('\n', self.pos)
+        end = len(self.text) if nl < 0 else nl + 1
+        out, self.pos = self.text[self.pos:end], end
+        return out
+
+
+def _streams(req) -> List[Tuple[Any, int, int]]:
+    """(file object, start, end) segments to sample from: binary files for
+    paths (offsets in bytes), ``_Text`` for inline logs (offsets in characters)."""
+    if req.sources:
+        out = []
+        for src in req.sources:
+            if src.path:
+                full = resolve_path(src.path)
+                ranges = src.ranges or [(0, os.path.getsize(full))]
+                fh = open(full, "rb")
+                out.extend((fh, s, e) for s, e in ranges)
+            else:
+                log = src.log or ""
+                out.append((_Text(log), 0, len(log)))
+        return out
+    return [(_Text(req.log), 0, len(req.log))]
+
+
+def _offsets(streams, windows: int, window: int, rng: random.Random):
+    """Stratified windows ``(segment, start, stop, limit)``: each segment gets
+    windows in proportion to its size, one per stratum; ``limit`` is where the
+    next stratum begins, so no window can run into the next one."""
+    total = sum(e - s for _, s, e in streams)
+    for i, (fh, start, end) in enumerate(streams):
+        size = end - start
+        if size <= 0: continue
+        k = max(1, round(windows * size / total))
+        if k * window >= size:                        # small enough: read it all
+            yield i, start, end, end
+            continue
+        stride = size / k
+        for j in range(k):
+            lo = start + int(j * stride)
+            nxt = start + int((j + 1) * stride) if j + 1 < k else end
+            off = rng.randint(lo, max(lo, nxt - window))
+            yield i, off, min(off + window, nxt), nxt
+
+
+def _window_lines(fh, start: int, stop: int, limit: int) -> Tuple[List[str], int]:
+    """Lines of one window: resync on the first block header after ``start``, read
+    to ``stop``, then finish the block in progress without reading past ``limit``.
+    Returns (lines, size used)."""
+    fh.seek(start)
+    data = fh.read(stop - start)
+    kind = type(data)
+    if start:
+        head = NEXT_HEAD_RE[kind].search(data)
+        if not head: return [], 0                      # window inside one giant block
+        data = data[head.start():]
+    tail = []
+    while fh.tell() < limit:
+        raw = fh.readline()
+        if not raw or LINE_HEAD_RE[kind].match(raw): break
+        tail.append(raw)
+    data += kind().join(tail)
+    text = data if kind is str else data.decode("utf-8", errors="replace")
+    return text.splitlines(keepends=True), len(data)
+
+
+def _diam_success(body: str) -> Optional[bool]:
+    m = DIAM_RESULT_ATTR_RE.search(body) or DIAM_RESULT_KV_RE.search(body)
+    if m: return m.group(1).upper().startswith('DIAMETER_SUCCESS')
+    code = DIAM_TAGGED_RE['result'].search(body) if 'ResultCode' in body else None
+    return code.group(1).startswith('2') if code else None
+
+
+def _window_counts(lines: List[str], numbers: SpaceSaving, ips: SpaceSaving) -> Counter:
+    """Per-window counters; copies of one SIP message are collapsed as in the full parse."""
+    counts, seen, paired = Counter(), set(), {}
+    for blk in _dedup_blocks(_iter_blocks(lines)):
+        ts, module, body = blk
+        counts['blocks'] += 1
+        for f in ANOMALY_RULES.scan(ts, module, body, seen, paired):
+            counts[f"anomaly:{f['rule']}"] += 1
+        start = SIP_START_RE.search(body)
+        if start:
+            line = start.group(0)
+            if line.startswith('SIP/2.0'):
+                code = int(line.split()[1])
+                counts['responses'] += 1
+                counts[f"response:{code // 100}xx"] += 1
+                if code >= 400: counts['errors'] += 1
+            else:
+                counts[f"method:{line.split(None, 1)[0]}"] += 1
+            nums = {_normalize_number(m.group(1)) for rx in (FROM_RE, TO_RE, PAI_RE)
+                    for m in rx.finditer(body)}
+            for num in nums:
+                if num: numbers.add(num)
+            peer = TRANSPORT_PEER_RE.search(body)
+            if peer: ips.add(peer.group(1))
+        elif 'diameter' in module or 'Answer' in body:
+            ok = _diam_success(body)
+            if ok is not None:
+                counts['diameter_answers'] += 1
+                counts['diameter_success'] += ok
+    return counts
+
+
+def _ratio(ys: List[float], xs: List[float], fpc: float) -> Tuple[Optional[float], float]:
+    """Cluster ratio estimator Σy/Σx and its 95% half-width."""
+    n, X = len(xs), sum(xs)
+    if not X: return None, 0.0
+    r = sum(ys) / X
+    if n < 2 or fpc <= 0: return r, 0.0
+    s2 = sum((y - r * x) ** 2 for y, x in zip(ys, xs)) / (n - 1)
+    return r, Z_95 * math.sqrt(fpc * s2 / n) / (X / n)
+
+
+def _estimate(ys, sizes, total: int, fpc: float) -> Dict[str, Any]:
+    r, half = _ratio(ys, sizes, fpc)
+    sample = int(sum(ys))
+    if r is None: return {'estimate': sample, 'ci95': [sample, sample], 'sample': sample}
+    est = r * total
+    return {'estimate': round(est), 'ci95': [max(sample, round(est - half * total)),
+                                             round(est + half * total)], 'sample': sample}
+
+
+def _proportion(ys, xs, fpc: float) -> Dict[str, Any]:
+    r, half = _ratio(ys, xs, fpc)
+    if r is None: return {'value': None, 'ci95': None, 'sample': 0}
+    return {'value': round(r, 4), 'ci95': [round(max(0.0, r - half), 4), round(min(1.0, r + half), 4)],
+            'sample': int(sum(xs))}
+
+
+def _top(sketch: SpaceSaving, scale: float) -> List[Dict[str, Any]]:
+    return [{'value': item, 'sample': count, 'estimate': round(count * scale),
+             'max_overcount': err} for item, count, err in sketch.top()]
+
+
+def quick_look(req, budget: int = QUICK_BYTES, windows: int = QUICK_WINDOWS,
+               seed: Optional[int] = None) -> Dict[str, Any]:
+    """Sample ``req.log`` / ``req.sources`` and extrapolate the traffic shape.
+
+    Windows of ``budget / windows`` bytes start at stratified random offsets,
+    resynchronize on the next block timestamp and run to the end of the block
+    they stop in. Each window is one cluster: totals use a ratio estimator on
+    window size, with a finite-population-corrected 95% interval, so a log
+    that fits in the budget is read whole and reported exactly.
+    """
+    streams = _streams(req)
+    try:
+        total  = sum(e - s for _, s, e in streams)
+        window = max(1, budget // max(windows, 1))
+        rng    = random.Random(seed)
+        numbers, ips = SpaceSaving(), SpaceSaving()
+        per_window: List[Counter] = []
+        sizes: List[int] = []
+        for i, start, stop, limit in _offsets(streams, windows, window, rng):
+            lines, nbytes = _window_lines(streams[i][0], start, stop, limit)
+            if not nbytes: continue
+            per_window.append(_window_counts(lines, numbers, ips))
+            sizes.append(nbytes)
+    finally:
+        for fh, *_ in streams: fh.close()
+
+    sampled = sum(sizes)
+    fraction = min(sampled / total, 1.0) if total else 1.0
+    fpc   = 1.0 - fraction
+    keys  = sorted(set().union(*per_window)) if per_window else []
+    col   = lambda k: [c[k] for c in per_window]
+    scale = 1 / fraction if fraction else 0.0
+
+    return {
+        'total_bytes':   total,
+        'sampled_bytes': sampled,
+        'fraction':      round(fraction, 6),
+        'windows':       len(sizes),
+        'blocks':        _estimate(col('blocks'), sizes, total, fpc),
+        'methods':       {k[7:]: _estimate(col(k), sizes, total, fpc) for k in keys if k.startswith('method:')},
+        'responses':     {k[9:]: _estimate(col(k), sizes, total, fpc) for k in keys if k.startswith('response:')},
+        'error_rate':    _proportion(col('errors'), col('responses'), fpc),
+        'diameter_success': _proportion(col('diameter_success'), col('diameter_answers'), fpc),
+        'anomalies':     {k[8:]: _estimate(col(k), sizes, total, fpc) for k in keys if k.startswith('anomaly:')},
+        'top_numbers':   _top(numbers, scale),
+        'top_ips':       _top(ips, scale),
+    }
@@ -0,0 +1,147 @@
+from datetime import date
+from typing import Dict, Any, Optional, List
+
+# Bucket widths (seconds) the engine may coarsen through; each divides the next
+STEPS       = [1, 5, 10, 30, 60, 300, 600, 1800, 3600, 86400]
+MAX_BUCKETS = 1440
+
+_day_cache: Dict[str, int] = {}
+
+def _epoch(ts: str) -> Optional[float]:
+    """Seconds since 0001-01-01 for a YATE timestamp (YYYY-MM-DD_HH:MM:SS.ffffff)."""
+    try:
+        day = _day_cache.get(ts[:10])
+        if day is None:
+            day = date(int(ts[0:4]), int(ts[5:7]), int(ts[8:10])).toordinal() * 86400
+            _day_cache[ts[:10]] = day
+        return day + int(ts[11:13]) * 3600 + int(ts[14:16]) * 60 + float(ts[17:])
+    except (ValueError, IndexError):
+        return None
+
+def _fmt_epoch(sec: float) -> str:
+    ms = round(sec * 1000)                       # round first: 59.9996 s must carry into the minute
+    d  = date.fromordinal(ms // 86400000)
+    s, ms = divmod(ms % 86400000, 1000)
+    return f"{d.isoformat()}_{s // 3600:02d}:{s % 3600 // 60:02d}:{s % 60:02d}.{ms:03d}"
+
+
+class RateEngine:
+    """Fixed-memory per-bucket event counters built in one pass over the timeline.
+
+    Buckets start at one second; when the log spans more than MAX_BUCKETS
+    buckets, existing counts are merged into the next coarser width in STEPS,
+    so memory stays bounded by MAX_BUCKETS × number of series.
+    """
+    def __init__(self, step: int = 1):
+        self.step   = step
+        self.origin = None
+        self.series: Dict[str, List[int]] = {}
+
+    def add(self, ts: str, method: str, diam_result: str = None,
+            network_down: bool = False, n: int = 1):
+        t = _epoch(ts)
+        if t is None: return
+        if self.origin is None:
+            self.origin = t - t % self.step
+        elif t < self.origin:
+            self._rebase(t)
+        idx = int((t - self.origin) // self.step)
+        while idx >= MAX_BUCKETS and self.step < STEPS[-1]:
+            self._coarsen()
+            idx = int((t - self.origin) // self.step)
+        idx = min(max(idx, 0), MAX_BUCKETS - 1)
+
+        if method[:3].isdigit():
+            if method[0] in '45': self._inc(f"{method[0]}xx", idx, n)
+        elif method.startswith('ROUTE/FAIL'):
+            self._inc('route_fail', idx, n)
+        elif method != 'INTERNAL':
+            self._inc(method, idx, n)
+        if diam_result:
+            self._inc(f"diameter:{diam_result}", idx, n)
+        if network_down:
+            self._inc('network_down', idx, n)
+
+    def _inc(self, name: str, idx: int, n: int):
+        arr = self.series.get(name)
+        if arr is None:
+            arr = self.series[name] = [0] * MAX_BUCKETS
+        arr[idx] += n
+
+    def _last(self) -> int:
+        return max((max(i for i, c in enumerate(a) if c)
+                    for a in self.series.values() if any(a)), default=-1)
+
+    def _rebase(self, t: float):
+        """Move the origin back over an out-of-order timestamp, coarsening if needed.
+
+        If the span would not fit in MAX_BUCKETS even at the coarsest step,
+        the origin stays put and ``t`` is clamped into bucket 0, just as late
+        outliers are clamped into the last bucket.
+        """
+        last = self._last()
+        if last < 0:
+            self.origin = t - t % self.step
+            return
+        top = STEPS[-1]
+        if (self.origin + last * self.step - (t - t % top)) // top >= MAX_BUCKETS:
+            return
+        while True:
+            new_origin = t - t % self.step
+            shift = int((self.origin - new_origin) // self.step)
+            if last + shift < MAX_BUCKETS: break
+            self._coarsen()
+            last = self._last()
+        for name, arr in self.series.items():
+            self.series[name] = ([0] * shift + arr)[:MAX_BUCKETS]
+        self.origin = new_origin
+
+    def _coarsen(self):
+        new_step   = next(s for s in STEPS if s > self.step)
+        new_origin = self.origin - self.origin % new_step
+        for name, arr in self.series.items():
+            merged = [0] * MAX_BUCKETS
+            for i, c in enumerate(arr):
+                if c:
+                    j = int((self.origin + i * self.step - new_origin) // new_step)
+                    merged[min(j, MAX_BUCKETS - 1)] += c
+            self.series[name] = merged
+        self.step, self.origin = new_step, new_origin
+
+    def result(self) -> Dict[str, Any]:
+        """Compact time-series arrays, trimmed to the last non-empty bucket."""
+        if self.origin is None:
+            return {'start': None, 'step': self.step, 'buckets': 0, 'series': {}}
+        used = self._last() + 1
+        return {
+            'start':   _fmt_epoch(self.origin),
+            'step':    self.step,
+            'buckets': used,
+            'series':  {k: a[:used] for k, a in sorted(self.series.items())},
+        }
+
+
+def rebin(rates: Dict[str, Any], step: int) -> Dict[str, Any]:
+    """Re-bucket a RateEngine result to a coarser step (e.g. 60 for per-minute)."""
+    if not rates or not rates.get('start') or step <= rates['step']:
+        return rates
+    if step % rates['step']:
+        raise ValueError(f"rate_step must be a multiple of {rates['step']}s")
+    origin     = _epoch(rates['start'])
+    new_origin = origin - origin % step
+    factor     = rates['step']
+    series     = {}
+    for name, arr in rates['series'].items():
+        out: List[int] = []
+        for i, c in enumerate(arr):
+            j = int((origin + i * factor - new_origin) // step)
+            if j >= len(out): out.extend([0] * (j + 1 - len(out)))
+            out[j] += c
+        series[name] = out
+    used = max((len(a) for a in series.values()), default=0)
+    return {
+        'start':   _fmt_epoch(new_origin),
+        'step':    step,
+        'buckets': used,
+        'series':  {k: a + [0] * (used - len(a)) for k, a in series.items()},
+    }
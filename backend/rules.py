@@ -0,0 +1,189 @@
+import os
+import re
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import yaml
+except ImportError:          # YAML rule files are optional
+    yaml = None
+
+DEFAULT_RULES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules", "anomalies.json")
+# Extra rule files (JSON, or YAML when PyYAML is installed), os.pathsep-separated
+EXTRA_RULES   = os.environ.get("SIP_ANOMALY_RULES", "")
+
+Builtin = Callable[[str, str, str], Optional[str]]   # (ts, module, body) → value
+PAIR_MAX = 10000             # unanswered requests remembered per scan for "paired" fields
+
+
+def _load_file(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as fh:
+        if path.endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise RuntimeError(f"PyYAML is required to load {path}")
+            data = yaml.safe_load(fh)
+        else:
+            data = json.load(fh)
+    return data.get("rules", []) if isinstance(data, dict) else data
+
+
+def load_rules(extra: str = EXTRA_RULES) -> List[Dict[str, Any]]:
+    """Default rules plus any extra files; a rule with the same id replaces the default."""
+    rules: Dict[str, Dict[str, Any]] = {}
+    for path in [DEFAULT_RULES] + [p for p in extra.split(os.pathsep) if p]:
+        for rule in _load_file(path):
+            rules[rule["id"]] = rule
+    return list(rules.values())
+
+
+def _trie_pattern(words: List[str]) -> str:
+    """Alternation regex with shared prefixes factored out, e.g. ab|ac → a(?:b|c)."""
+    trie: Dict[str, Any] = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node) -> str:
+        end  = "" in node
+        alts = [re.escape(ch) + build(sub) for ch, sub in sorted(node.items()) if ch]
+        if not alts: return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return f"(?:{body})?" if end else body
+    return build(trie)
+
+
+class _Rule:
+    __slots__ = ("id", "severity", "triggers", "require", "ignore_case", "on",
+                 "regex", "fields", "message", "scope")
+
+    def __init__(self, spec: Dict[str, Any]):
+        flags            = re.IGNORECASE if spec.get("ignore_case") else 0
+        self.id          = spec["id"]
+        self.severity    = spec.get("severity", "minor")
+        self.ignore_case = bool(spec.get("ignore_case"))
+        self.triggers    = [t.lower() if self.ignore_case else t for t in spec["triggers"]]
+        self.require     = [t.lower() if self.ignore_case else t for t in spec.get("require", [])]
+        self.on          = spec.get("on", "body")
+        self.regex       = re.compile(spec["regex"], flags | re.MULTILINE) if spec.get("regex") else None
+        self.message     = spec["message"]
+        self.scope       = spec.get("scope", "global")
+        self.fields      = {
+            name: ([src if src.startswith("@") else re.compile(src, flags | re.MULTILINE)
+                    for src in f.get("from", [])], f.get("default"), bool(f.get("paired")))
+            for name, f in spec.get("fields", {}).items()
+        }
+
+
+class RuleEngine:
+    """Anomaly rules compiled into one trie-regex prefilter plus per-rule extractors.
+
+    Each block is scanned once by the prefilter; only rules whose trigger
+    keywords appeared run their own regex and field extractors, so the scan
+    cost does not grow with the number of rules.
+
+    A field marked ``"paired": true`` that finds nothing in an answer is
+    extracted from the matching request instead: the optional ``pair_key``
+    builtin returns ``(key, is_request)`` (e.g. a Diameter end-to-end id), and
+    requests are remembered in the ``paired`` dict the caller passes to scan.
+    """
+    def __init__(self, specs: List[Dict[str, Any]], builtins: Dict[str, Builtin]):
+        self.rules    = [_Rule(s) for s in specs]
+        self.builtins = builtins
+        self.by_kw: Dict[str, List[_Rule]] = {}
+        for rule in self.rules:
+            for kw in rule.triggers:
+                self.by_kw.setdefault(kw.lower(), []).append(rule)
+        self.prefilter = re.compile(_trie_pattern(sorted(self.by_kw)), re.IGNORECASE) \
+                         if self.by_kw else None
+        # A prefilter match consumes its text, so keywords nested inside a
+        # longer matched keyword are expanded from the match instead, and
+        # keywords that start inside it but run past its end (a suffix of the
+        # match is their prefix) are confirmed with a substring check
+        self.expand  = {kw: [k for k in self.by_kw if k in kw] for kw in self.by_kw}
+        self.overlap = {kw: [k for k in self.by_kw if k not in kw and
+                             any(kw.endswith(k[:i]) for i in range(1, min(len(k), len(kw))))]
+                        for kw in self.by_kw}
+
+    def scan(self, ts: str, module: str, body: str, seen: set,
+             paired: Optional[dict] = None) -> List[Dict[str, Any]]:
+        """Findings for one block; ``seen`` tracks (rule, Call-ID) for dialog-scoped
+        rules and ``paired`` (per log, optional) the requests awaiting an answer."""
+        if self.prefilter is None: return []
+        request = self._pair(ts, module, body, paired) if paired is not None else None
+        hits = {m.group(0).lower() for m in self.prefilter.finditer(body)}
+        if not hits: return []
+        kws = [kw for hit in hits for kw in self.expand[hit]]
+        lowered = None
+        maybe = [kw for hit in hits for kw in self.overlap[hit]]
+        if maybe:
+            lowered = body.lower()
+            kws.extend(kw for kw in maybe if kw in lowered)
+        candidates = list(dict.fromkeys(r for kw in kws for r in self.by_kw[kw]))
+        found = []
+        for rule in candidates:
+            if rule.ignore_case:
+                lowered = lowered if lowered is not None else body.lower()
+                text = lowered
+            else:
+                text = body
+            if not any(t in text for t in rule.triggers): continue
+            if not all(t in text for t in rule.require): continue
+
+            values = {'ts': ts, 'module': module}
+            if rule.on != "body" or "{start_line" in rule.message:
+                values['start_line'] = self.builtins['start_line'](ts, module, body) or ''
+            target = values.get('start_line', '') if rule.on == "start_line" else \
+                     (self.builtins['first_line'](ts, module, body) or '') if rule.on == "first_line" else body
+            if rule.regex:
+                m = rule.regex.search(target)
+                if not m: continue
+                values.update({k: v for k, v in m.groupdict().items() if v is not None})
+            for name, (sources, default, from_request) in rule.fields.items():
+                value = self._extract(sources, ts, module, body, None)
+                if value is None and from_request and request:
+                    value = self._extract(sources, *request, None)
+                values[name] = default if value is None else value
+
+            call_id = self.builtins['call_id'](ts, module, body)
+            if rule.scope == "dialog" and call_id:
+                if (rule.id, call_id) in seen: continue
+                seen.add((rule.id, call_id))
+            found.append({
+                'rule':     rule.id,
+                'severity': rule.severity,
+                'ts':       ts,
+                'call_id':  call_id,
+                'message':  rule.message.format_map(_Missing(values)),
+            })
+        return found
+
+    def _pair(self, ts, module, body, paired: dict):
+        """Remember a request, or return the remembered request an answer pairs with."""
+        pair_key = self.builtins.get('pair_key')
+        pk = pair_key(ts, module, body) if pair_key else None
+        if not pk: return None
+        key, is_request = pk
+        if not is_request:
+            return paired.pop(key, None)
+        paired.setdefault(key, (ts, module, body))
+        if len(paired) > PAIR_MAX:
+            paired.pop(next(iter(paired)))
+        return None
+
+    def _extract(self, sources, ts, module, body, default):
+        for src in sources:
+            if isinstance(src, str):
+                value = self.builtins[src[1:]](ts, module, body)
+            else:
+                m = src.search(body)
+                value = m.group(1) if m else None
+            if value: return value
+        return default
+
+
+class _Missing(dict):
+    """format_map helper — unknown placeholders render as '?' instead of raising."""
+    def __missing__(self, key):
+        return '?'
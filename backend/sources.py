@@ -0,0 +1,104 @@
+import io
+import os
+from typing import BinaryIO, Iterator, List, Optional
+from models import LogSource
+from parser import Block, _iter_blocks, _extract_blocks, _tag_blocks, _merge_blocks
+from logview import blocks_text
+
+# Server-side log archive; path sources are refused unless this is set
+LOG_DIR = os.environ.get("SIP_LOG_DIR")
+
+
+def resolve_path(path: str) -> str:
+    """Resolve ``path`` inside LOG_DIR, rejecting anything that escapes it."""
+    if not LOG_DIR:
+        raise ValueError("Path sources are disabled (SIP_LOG_DIR not set)")
+    root = os.path.realpath(LOG_DIR)
+    full = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, full]) != root:
+        raise ValueError(f"Path outside log directory: {path}")
+    if not os.path.isfile(full):
+        raise ValueError(f"No such log file: {path}")
+    return full
+
+
+def iter_lines(fh: BinaryIO) -> Iterator[str]:
+    for raw in fh:
+        yield raw.decode("utf-8", errors="replace")
+
+
+def iter_file_blocks(fh: BinaryIO, progress=None) -> Iterator[Block]:
+    """Stream blocks from a binary file object, one timestamp chunk at a time."""
+    return _iter_blocks(iter_lines(fh), progress)
+
+
+def iter_range_blocks(fh: BinaryIO, ranges, progress=None) -> Iterator[Block]:
+    """Stream blocks from block-aligned byte ranges of ``fh`` only (as returned by /search)."""
+    def lines():
+        for start, end in sorted(ranges):
+            fh.seek(start)
+            pos = start
+            while pos < end:
+                raw = fh.readline()
+                if not raw: break
+                pos += len(raw)
+                yield raw.decode("utf-8", errors="replace")
+    return _iter_blocks(lines(), progress)
+
+
+def iter_text_blocks(text: str, progress=None) -> Iterator[Block]:
+    """Stream blocks from an in-memory log (progress-reporting ``_extract_blocks``)."""
+    return _iter_blocks(io.StringIO(text), progress)
+
+
+def _open_source(src: LogSource, progress=None) -> Iterator[Block]:
+    if src.path:
+        fh = open(resolve_path(src.path), "rb")
+        try: yield from (iter_range_blocks(fh, src.ranges, progress) if src.ranges
+                         else iter_file_blocks(fh, progress))
+        finally: fh.close()
+    elif progress is not None:
+        yield from iter_text_blocks(src.log or "", progress)
+    else:
+        yield from _extract_blocks(src.log or "")
+
+
+def sources_size(sources: List[LogSource]) -> int:
+    """Total input size in bytes (inline logs as UTF-8); raises ValueError for
+    any path that ``resolve_path`` refuses, so callers can validate up front."""
+    total = 0
+    for s in sources:
+        if s.path:
+            full = resolve_path(s.path)
+            total += sum(e - b for b, e in s.ranges) if s.ranges else os.path.getsize(full)
+        else:
+            total += len((s.log or "").encode())
+    return total
+
+
+def merge_sources(sources: List[LogSource], progress=None) -> Iterator[Block]:
+    """Tag each source's blocks with its node and merge them by timestamp."""
+    streams = []
+    for i, src in enumerate(sources):
+        node = src.node or (os.path.basename(src.path) if src.path else f"node{i + 1}")
+        streams.append(_tag_blocks(_open_source(src, progress), node, src.clock_offset_ms))
+    return _merge_blocks(streams)
+
+
+def sources_text(sources: List[LogSource]) -> str:
+    """Text for the raw log viewer: a single whole source verbatim, otherwise the
+    merged blocks with node prefixes."""
+    if len(sources) == 1 and not sources[0].ranges:
+        src = sources[0]
+        if not src.path: return src.log or ""
+        with open(resolve_path(src.path), encoding="utf-8", errors="replace") as fh:
+            return fh.read()
+    return blocks_text(merge_sources(sources))
+
+
+def merge_files(files: List[BinaryIO], nodes: List[str],
+                offsets: Optional[List[float]] = None) -> Iterator[Block]:
+    """Same as merge_sources for already-open binary files (e.g. uploads)."""
+    offsets = offsets or [0] * len(files)
+    return _merge_blocks([_tag_blocks(iter_file_blocks(fh), node, off)
+                          for fh, node, off in zip(files, nodes, offsets)])
@@ -0,0 +1,51 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+STORE_MAX = int(os.environ.get("SIP_STORE_MAX", "16"))
+STORE_TTL = int(os.environ.get("SIP_STORE_TTL", "1800"))
+
+
+class ResultStore:
+    """Thread-safe in-memory LRU with per-entry TTL.
+
+    Keeps the newest ``max_items`` entries; entries not read within ``ttl``
+    seconds are evicted on the next access.
+    """
+    def __init__(self, max_items: int = STORE_MAX, ttl: int = STORE_TTL):
+        self.max_items = max_items
+        self.ttl       = ttl
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock     = threading.Lock()
+
+    def put(self, value: Any, key: Optional[str] = None) -> str:
+        key = key or uuid.uuid4().hex
+        with self._lock:
+            self._items[key] = (time.monotonic(), value)
+            self._items.move_to_end(key)
+            self._evict()
+        return key
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            self._evict()
+            item = self._items.get(key)
+            if item is None: return None
+            self._items[key] = (time.monotonic(), item[1])
+            self._items.move_to_end(key)
+            return item[1]
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._items:
+            key, (stamp, _) = next(iter(self._items.items()))
+            if len(self._items) > self.max_items or now - stamp > self.ttl:
+                del self._items[key]
+            else:
+                break
+
+
+analyses = ResultStore()
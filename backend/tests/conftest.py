@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Backend modules import each other as top-level modules (``from parser import ...``)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SIP_WARMUP", "0")
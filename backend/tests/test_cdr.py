@@ -0,0 +1,28 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import sources
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(sources, "LOG_DIR", str(tmp_path))
+    (tmp_path / "ok.log").write_text("")
+    return TestClient(main.app)
+
+
+@pytest.mark.parametrize("src", [
+    {"path": "missing.log"},
+    {"path": "../outside.log"},
+    {"path": "missing.log", "ranges": [[0, 10]]},
+])
+def test_cdr_bad_path_is_400(client, src):
+    r = client.post("/cdr", json={"sources": [src]})
+    assert r.status_code == 400
+    assert "detail" in r.json()
+
+
+def test_cdr_good_path_streams(client):
+    r = client.post("/cdr", json={"sources": [{"path": "ok.log"}]})
+    assert r.status_code == 200
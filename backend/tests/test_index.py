@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+import index
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    root = tmp_path / "logs"
+    root.mkdir()
+    monkeypatch.setattr(index, "LOG_DIR", str(root))
+    monkeypatch.setattr(index, "INDEX_DB", str(tmp_path / "index.sqlite"))
+    monkeypatch.setattr(index, "failures", {})
+    return root
+
+
+@pytest.mark.skipif(os.geteuid() == 0, reason="root can read any file")
+def test_unreadable_file_is_reported(archive, caplog):
+    bad = archive / "bad.log"
+    bad.write_text("2024-01-01_00:00:00.000000 <sip:INFO> x\nCall-ID: a@b\n")
+    bad.chmod(0)
+    stats = index.refresh()
+    assert stats['failed'] == 1
+    assert "bad.log" in stats['failures']
+    assert "bad.log" in caplog.text
+
+
+def test_failure_is_reported_and_cleared(archive, monkeypatch, caplog):
+    (archive / "a.log").write_text("2024-01-01_00:00:00.000000 <sip:INFO> x\nCall-ID: a@b\n")
+    real = index._index_file
+
+    def broken(*args):
+        raise index.sqlite3.OperationalError("disk I/O error")
+    monkeypatch.setattr(index, "_index_file", broken)
+    stats = index.refresh()
+    assert stats['failed'] == 1
+    assert stats['failures'] == {"a.log": "OperationalError: disk I/O error"}
+    assert "a.log" in caplog.text
+
+    monkeypatch.setattr(index, "_index_file", real)
+    stats = index.refresh()
+    assert stats['failed'] == 0 and stats['failures'] == {}
+    assert index.search("a@b")['hits'][0]['path'] == "a.log"
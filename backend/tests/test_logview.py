@@ -0,0 +1,24 @@
+from logview import LogView, FileLogView
+
+LOG = ("2024-01-01_00:00:00.000000 <sip:INFO> 'received' from 10.0.0.1:5060\r\n"
+       "INVITE sip:+41790000002@ims.example SIP/2.0\r\n"
+       "Call-ID: a@b\r\n"
+       "2024-01-01_00:00:01.000000 <sip:INFO> 'sending' to 10.0.0.1:5060\n"
+       "SIP/2.0 180 Ringing – ü\n")
+
+
+def test_file_view_matches_str_view(tmp_path):
+    path = tmp_path / "up.log"
+    path.write_bytes(LOG.encode())
+    text, mapped = LogView(LOG), FileLogView(str(path))
+    path.unlink()                                 # the mapping outlives the spooled file
+    assert len(mapped) == len(text) == 5
+    assert list(mapped.blocks) == list(text.blocks) == [0, 3]
+    for kw in ({}, {'q': 'ringing'}, {'method': 'INVITE'}, {'call_id': 'a@b'}):
+        assert mapped.search(**kw) == text.search(**kw)
+
+
+def test_file_view_empty(tmp_path):
+    path = tmp_path / "empty.log"
+    path.write_bytes(b"")
+    assert FileLogView(str(path)).search()['lines'] == LogView("").search()['lines']
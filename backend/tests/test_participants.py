@@ -0,0 +1,23 @@
+from analyzer import analyze
+from models import AnalyzeRequest
+from parser import parse_blocks, _extract_blocks
+
+IMSI = "228011234567890"
+LOG = f"""2024-01-01_00:00:00.000000 <sip:INFO> 'received 400 bytes' from 10.0.1.1:5060
+-----
+REGISTER sip:ims.example SIP/2.0
+From: <sip:+41791234000@ims.example>;tag=1
+To: <sip:+41791234000@ims.example>
+Authorization: Digest username="{IMSI}@ims.example"
+Contact: <sip:{IMSI}@ims.example;transport=udp>
+Call-ID: reg@10.0.1.1
+CSeq: 1 REGISTER
+-----
+"""
+
+
+def test_imsi_resolved_from_msisdn():
+    index = parse_blocks(_extract_blocks(LOG))['participant_index']
+    assert index['imsi_by_number']['41791234000'] == IMSI
+    resp = analyze(AnalyzeRequest(caller="+41791234000", log=LOG))
+    assert resp.participants[0].imsi == IMSI
@@ -0,0 +1,24 @@
+from analyzer import analyze
+from models import AnalyzeRequest
+from quick import quick_look
+
+INVITE = """{ts} <sip:INFO> 'received 400 bytes' from 10.0.1.1:5060
+-----
+INVITE sip:+41797654000@ims.example SIP/2.0
+Via: SIP/2.0/UDP 10.0.1.1:5060;branch=z9hG4bKq1
+From: <sip:+41791234000@ims.example>;tag=1
+To: <sip:+41797654000@ims.example>
+Call-ID: q@10.0.1.1
+CSeq: 1 INVITE
+-----
+"""
+LOG = INVITE.format(ts="2024-01-01_00:00:00.000000") + INVITE.format(ts="2024-01-01_00:00:00.500000")
+
+
+def test_retransmitted_invite_counted_once():
+    q = quick_look(AnalyzeRequest(log=LOG, flags=["+quick"]), seed=1)
+    assert q['fraction'] == 1.0
+    assert q['methods']['INVITE']['estimate'] == 1
+    assert q['blocks']['estimate'] == 1
+    full = analyze(AnalyzeRequest(log=LOG, flags=["+full"]))
+    assert len([e for e in full.timeline if e.method.startswith("INVITE")]) == 1
@@ -0,0 +1,26 @@
+from rates import RateEngine, _epoch, _fmt_epoch
+
+
+def test_far_early_outlier_keeps_counts():
+    eng = RateEngine()
+    for i in range(100):
+        eng.add(f"2026-10-18_10:00:{i % 60:02d}.000000", "INVITE")
+    eng.add("2001-01-01_00:00:00.000000", "INVITE")
+    res = eng.result()
+    assert sum(res['series']['INVITE']) == 101
+    assert res['start'].startswith("2026-10-18")
+
+
+def test_early_timestamp_within_span_rebases():
+    eng = RateEngine()
+    eng.add("2026-10-18_10:00:10.000000", "INVITE")
+    eng.add("2026-10-18_10:00:05.000000", "BYE")
+    res = eng.result()
+    assert res['start'] == "2026-10-18_10:00:05.000"
+    assert res['series'] == {'BYE': [1, 0, 0, 0, 0, 0], 'INVITE': [0, 0, 0, 0, 0, 1]}
+
+
+def test_fmt_epoch_carries_rounded_seconds():
+    assert _fmt_epoch(_epoch("2026-10-18_10:00:59.9996")) == "2026-10-18_10:01:00.000"
+    assert _fmt_epoch(_epoch("2026-12-31_23:59:59.9999")) == "2027-01-01_00:00:00.000"
+    assert _fmt_epoch(_epoch("2026-10-18_10:00:05.250000")) == "2026-10-18_10:00:05.250"
@@ -0,0 +1,17 @@
+from analyzer import _routing, _routing_stats, _routing_table
+from parser import Block
+
+BODY = ("INVITE sip:+41797654000@ims.example SIP/2.0\n"
+        "Via: SIP/2.0/UDP 10.0.1.1:5060;branch=z9hG4bK1;maddr=239.0.0.1;ttl=16;x-custom=1\n"
+        "Route: <sip:orig@pcscf.ims.example:5060;lr>\n"
+        "Call-ID: r@1\n")
+
+
+def test_routing_info_keeps_raw_headers():
+    rows = _routing_table([Block("2024-01-01_00:00:00.000000", "sip:INFO", BODY)])
+    entry = _routing(rows)[0]
+    assert "Via: SIP/2.0/UDP 10.0.1.1:5060;branch=z9hG4bK1;maddr=239.0.0.1;ttl=16;x-custom=1" in entry
+    assert "Route: <sip:orig@pcscf.ims.example:5060;lr>" in entry
+    stats = _routing_stats(rows)
+    assert stats['table'][0]['vias'][0]['host'] == "10.0.1.1"
+    assert stats['table'][0]['routes'] == ["pcscf.ims.example"]
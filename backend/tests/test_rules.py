@@ -0,0 +1,29 @@
+from parser import parse_blocks, _extract_blocks
+
+CCR = """{ts} <diameter:ALL> Sending CCR eeident="{ee}"
+<CreditControlRequest eeident="{ee}"><SessionId>pgw;{sess};1</SessionId><CcRequestType>update</CcRequestType><SubscriptionId><SubscriptionIdType>imsi</SubscriptionIdType><SubscriptionIdData>{sub}</SubscriptionIdData></SubscriptionId></CreditControlRequest>
+"""
+CCA = """{ts} <diameter:ALL> Received CCA eeident="{ee}"
+<CreditControlAnswer eeident="{ee}" diameter_result="{result}"><SessionId>pgw;{sess};1</SessionId><ResultCode>4012</ResultCode></CreditControlAnswer>
+"""
+
+
+def _messages(log):
+    return [f['message'] for f in parse_blocks(_extract_blocks(log))['anomaly_details']]
+
+
+def test_answer_rules_name_the_request_subscriber():
+    log = (CCR.format(ts="2024-01-01_00:00:00.000000", ee=7, sess=12345678900, sub="228011234567890")
+           + CCR.format(ts="2024-01-01_00:00:00.100000", ee=8, sess=12345678901, sub="228019999999999")
+           + CCA.format(ts="2024-01-01_00:00:00.200000", ee=8, sess=12345678901,
+                        result="DIAMETER_CREDIT_LIMIT_REACHED")
+           + CCA.format(ts="2024-01-01_00:00:00.300000", ee=7, sess=12345678900, result="QUOTA_EXCEEDED"))
+    msgs = _messages(log)
+    assert "Diameter DIAMETER_CREDIT_LIMIT_REACHED — subscriber 228019999999999" in msgs
+    assert "Diameter quota issue (QUOTA_EXCEEDED) — subscriber 228011234567890" in msgs
+
+
+def test_unpaired_answer_falls_back_to_default():
+    log = CCA.format(ts="2024-01-01_00:00:00.000000", ee=9, sess=12345678900,
+                     result="DIAMETER_CREDIT_LIMIT_REACHED")
+    assert _messages(log) == ["Diameter DIAMETER_CREDIT_LIMIT_REACHED — subscriber ?"]
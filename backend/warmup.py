@@ -0,0 +1,71 @@
+import os
+import time
+from typing import Dict, Any
+from pydantic_core import to_json
+from models import AnalyzeRequest
+from analyzer import analyze
+from sources import iter_text_blocks
+from exporter import to_csv
+from logview import LogView
+
+# Set SIP_WARMUP=0 to report ready immediately (e.g. local development)
+WARMUP_ENABLED = os.environ.get("SIP_WARMUP", "1") != "0"
+
+_SIP = """{ts} <sip:INFO> '{dir}' {peer} 10.0.1.1:5060
+-----
+{start}
+Via: SIP/2.0/UDP 10.0.1.1:5060;branch=z9hG4bKwarm{branch}
+From: <sip:+41790000001@ims.example>;tag=1
+To: <sip:+41790000002@ims.example>;tag=2
+Call-ID: warmup@10.0.0.1
+CSeq: {cseq}
+User-Agent: Warmup
+P-RTP-Stat: PS=10,OS=1600,PR=10,OR=1600,PL=0,PD=0,JI=1
+{sdp}-----
+"""
+_SDP = """Content-Type: application/sdp
+
+v=0
+c=IN IP4 10.0.1.5
+m=audio 4000 RTP/AVP 8
+a=rtpmap:8 PCMA/8000
+a=sendrecv
+"""
+_DIAM = """{ts} <diameter:ALL> Sending CCR eeident="1"
+<CreditControlRequest eeident="1"><SessionId>warm;12345678900;1</SessionId><CcRequestType>initial</CcRequestType><ServiceContextId>32251@3gpp.org</ServiceContextId></CreditControlRequest>
+{ts2} <diameter:ALL> Received CCA eeident="1"
+<CreditControlAnswer eeident="1" diameter_result="DIAMETER_SUCCESS"><SessionId>warm;12345678900;1</SessionId><ResultCode>2001</ResultCode><GrantedServiceUnit><CcTotalOctets>1000</CcTotalOctets></GrantedServiceUnit></CreditControlAnswer>
+"""
+
+def _warmup_log() -> str:
+    """A one-call synthetic log touching the SIP, SDP, RTP and Diameter paths."""
+    steps = [('INVITE sip:+41790000002@ims.example SIP/2.0', '1 INVITE', True),
+             ('SIP/2.0 180 Ringing', '1 INVITE', False),
+             ('SIP/2.0 200 OK', '1 INVITE', True),
+             ('BYE sip:+41790000002@ims.example SIP/2.0', '2 BYE', False)]
+    parts = []
+    for i, (start, cseq, sdp) in enumerate(steps):
+        request = not start.startswith('SIP/2.0')
+        parts.append(_SIP.format(ts=f"2024-01-01_00:00:0{i}.000000", start=start, cseq=cseq,
+                                 dir='received 400 bytes' if request else 'sending 400 bytes',
+                                 peer='from' if request else 'to', branch=i // 3,
+                                 sdp=_SDP if sdp else ''))
+    parts.append(_DIAM.format(ts="2024-01-01_00:00:04.000000", ts2="2024-01-01_00:00:04.020000"))
+    return ''.join(parts)
+
+
+def warmup() -> Dict[str, Any]:
+    """Run one full analysis so first-request costs (lazy caches, pydantic
+    validators, serializers) are paid before the worker reports ready.
+
+    The log is passed as blocks so it stays out of the shared parse cache.
+    """
+    t0  = time.perf_counter()
+    log = _warmup_log()
+    req = AnalyzeRequest(caller="+41790000001", callee="+41790000002", log=log, flags=["+full"])
+    resp = analyze(req, iter_text_blocks(log))
+    to_json(resp)
+    to_csv(resp)
+    LogView(log).search(0, 10, q="invite")
+    return {'ms': round((time.perf_counter() - t0) * 1000, 1),
+            'events': len(resp.timeline)}
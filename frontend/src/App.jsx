@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import axios from "axios";
 import InputForm    from "./components/InputForm";
 import Timeline     from "./components/Timeline";
@@ -10,9 +10,17 @@ import RawLogViewer from "./components/RawLogViewer";
 import ExportBar    from "./components/ExportBar";
 import ThemeToggle  from "./components/ThemeToggle";
 import DataUsage    from "./components/DataUsage";
+import QuickLook    from "./components/QuickLook";
+import TransactionLatency from "./components/TransactionLatency";
 
 const API  = import.meta.env.VITE_API_URL || "";
-const TABS = ["Timeline","Participants","BYE Analysis","RTP Stats","Anomalies","Data Usage","Raw Log"];
+// Uploads above this size go through the background /jobs queue (no gateway timeouts)
+const JOB_THRESHOLD = 20 * 1024 * 1024;
+const sleep = (ms) => new Promise(r => setTimeout(r, ms));
+const TABS = ["Quick Look","Timeline","Participants","BYE Analysis","RTP Stats","Anomalies","Data Usage",
+              "Txn Latency","Raw Log"];
+// Shown only when the result carries that section
+const OPTIONAL_TABS = { "Quick Look": "quick_look", "Txn Latency": "transaction_latency" };
 
 export default function App() {
   const [dark, setDark] = useState(() => window.matchMedia("(prefers-color-scheme: dark)").matches);
@@ -22,30 +30,61 @@ export default function App() {
   const [result,  setResult]  = useState(null);
   const [loading, setLoading] = useState(false);
   const [error,   setError]   = useState(null);
+  const [jobProgress, setJobProgress] = useState(null);
+  // Hash of the last pasted log the server parsed — re-analysis sends only this
+  const lastLog = useRef({ log: null, hash: null });
   const [tab,     setTab]     = useState("Timeline");
 
   useEffect(() => {
     document.documentElement.classList.toggle("dark", dark);
   }, [dark]);
 
+  const runJob = async (payload) => {
+    const { data: job } = await axios.post(`${API}/jobs/upload`, payload,
+                                           { headers:{"Content-Type":"multipart/form-data"} });
+    for (;;) {
+      await sleep(1000);
+      const { data: st } = await axios.get(`${API}/jobs/${job.job_id}`);
+      setJobProgress(st);
+      if (st.status === "done")   return axios.get(`${API}/jobs/${job.job_id}/result`);
+      if (st.status === "failed") throw new Error(st.error);
+    }
+  };
+
+  const analyzePasted = async (payload) => {
+    const { log, hash } = lastLog.current;
+    if (hash && log === payload.log) {
+      try {
+        return await axios.post(`${API}/analyze`, { ...payload, log: "", log_hash: hash });
+      } catch (e) {
+        if (e.response?.status !== 409) throw e;          // evicted server-side: resend the log
+      }
+    }
+    const res = await axios.post(`${API}/analyze`, payload);
+    lastLog.current = { log: payload.log, hash: res.data.log_hash };
+    return res;
+  };
+
   const handleAnalyze = async (payload, isFile = false) => {
-    setLoading(true); setError(null); setResult(null);
+    setLoading(true); setError(null); setResult(null); setJobProgress(null);
     try {
-      const res = isFile
+      const res = isFile && payload.get("file")?.size > JOB_THRESHOLD
+        ? await runJob(payload)
+        : isFile
         ? await axios.post(`${API}/analyze/upload`, payload, { headers:{"Content-Type":"multipart/form-data"} })
-        : await axios.post(`${API}/analyze`, payload);
+        : await analyzePasted(payload);
       setResult(res.data);
-      setTab("Timeline");
+      setTab(res.data.quick_look ? "Quick Look" : "Timeline");
     } catch (e) {
       setError(e.response?.data?.detail || e.message);
     } finally {
-      setLoading(false);
+      setLoading(false); setJobProgress(null);
     }
   };
 
   const badgeCount = (t) => {
     if (!result) return null;
-        const map = { Timeline: result.timeline?.length, Anomalies: result.anomalies?.length,
+        const map = { Timeline: result.timeline_total ?? result.timeline?.length, Anomalies: result.anomalies?.length,
                   Participants: result.participants?.length, "RTP Stats": result.rtp_stats?.length,
                   "Data Usage": result.data_usage?.length };
 
@@ -68,6 +107,14 @@ export default function App() {
       <main className="flex-1 p-4 md:p-6 max-w-screen-2xl mx-auto w-full">
         <InputForm form={form} setForm={setForm} onAnalyze={handleAnalyze} loading={loading} />
 
+        {jobProgress && (
+          <div className="mt-4 p-3 bg-blue-50 dark:bg-gray-800 border border-blue-200 dark:border-gray-700 rounded-lg text-sm text-blue-900 dark:text-blue-200">
+            Background job <span className="font-mono text-xs">{jobProgress.job_id.slice(0, 8)}</span>: {jobProgress.status}
+            {jobProgress.progress.fraction != null && ` — ${Math.round(jobProgress.progress.fraction * 100)}%`}
+            {` (${(jobProgress.progress.bytes_read / 1048576).toFixed(1)} MB, ${jobProgress.progress.blocks.toLocaleString()} blocks)`}
+          </div>
+        )}
+
         {error && (
           <div className="mt-4 p-4 bg-red-100 dark:bg-red-900/50 border border-red-300 dark:border-red-700 rounded-lg text-red-800 dark:text-red-200 text-sm">
             <strong>Error:</strong> {error}
@@ -91,7 +138,7 @@ export default function App() {
             <ExportBar formData={form} api={API} />
 
             <div className="flex flex-wrap gap-1 mt-4 border-b border-gray-200 dark:border-gray-700">
-              {TABS.map(t => (
+              {TABS.filter(t => !OPTIONAL_TABS[t] || result[OPTIONAL_TABS[t]]).map(t => (
                 <button key={t} onClick={() => setTab(t)}
                   className={`px-4 py-2 text-sm font-medium rounded-t-lg transition-colors ${
                     tab === t
@@ -109,13 +156,16 @@ export default function App() {
             </div>
 
             <div className="bg-white dark:bg-gray-800 border border-gray-200 dark:border-gray-700 rounded-b-lg rounded-tr-lg p-4 shadow-sm">
-              {tab === "Timeline"     && <Timeline     events={result.timeline} />}
+              {tab === "Timeline"     && <Timeline     events={result.timeline} api={API} analysisId={result.analysis_id}
+                                                      cursor={result.timeline_cursor} total={result.timeline_total} />}
               {tab === "Participants" && <Participants  data={result.participants} />}
               {tab === "BYE Analysis" && <ByeAnalysis  data={result.bye_info} />}
               {tab === "RTP Stats"    && <RTPStats      data={result.rtp_stats} sdp={result.sdp_info} />}
               {tab === "Anomalies"    && <Anomalies     data={result.anomalies} />}
               {tab === "Data Usage"   && <DataUsage     data={result.data_usage} />}
-              {tab === "Raw Log"      && <RawLogViewer  log={form.log} />}
+              {tab === "Quick Look"   && <QuickLook     data={result.quick_look} />}
+              {tab === "Txn Latency"  && <TransactionLatency data={result.transaction_latency} />}
+              {tab === "Raw Log"      && <RawLogViewer  api={API} analysisId={result.analysis_id} total={result.raw_lines} />}
             </div>
           </div>
         )}
@@ -4,6 +4,8 @@ const FLAG_OPTIONS = [
   { value: "+sdp",     label: "SDP Negotiation" },
   { value: "+pgw",     label: "PGW Events"       },
   { value: "+routing", label: "Routing Path"     },
+  { value: "+latency", label: "Txn Latency"      },
+  { value: "+quick",   label: "Quick Look"       },
   { value: "+full",    label: "Full Analysis"    },
 ];
 
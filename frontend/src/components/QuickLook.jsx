@@ -0,0 +1,88 @@
+const fmt = (n) => n?.toLocaleString() ?? "—";
+const pct = (v) => v == null ? "—" : `${(v * 100).toFixed(2)}%`;
+
+function EstimateTable({ title, rows }) {
+  if (!rows.length) return null;
+  return (
+    <div>
+      <p className="text-xs font-semibold text-gray-500 dark:text-gray-400 uppercase mb-2">{title}</p>
+      <table className="w-full text-sm">
+        <thead>
+          <tr className="bg-gray-100 dark:bg-gray-700 text-left">
+            {["", "Estimate", "95% CI", "In sample"].map(h => (
+              <th key={h} className="px-3 py-2 font-semibold text-gray-600 dark:text-gray-300 text-xs whitespace-nowrap">{h}</th>
+            ))}
+          </tr>
+        </thead>
+        <tbody>
+          {rows.map(([label, e]) => (
+            <tr key={label} className="border-b border-gray-100 dark:border-gray-700 hover:bg-gray-50 dark:hover:bg-gray-700/50">
+              <td className="px-3 py-2 font-mono text-xs">{label}</td>
+              <td className="px-3 py-2 font-semibold">~{fmt(e.estimate)}</td>
+              <td className="px-3 py-2 text-xs text-gray-500">{fmt(e.ci95[0])} – {fmt(e.ci95[1])}</td>
+              <td className="px-3 py-2">{fmt(e.sample)}</td>
+            </tr>
+          ))}
+        </tbody>
+      </table>
+    </div>
+  );
+}
+
+function TopTable({ title, rows }) {
+  if (!rows?.length) return null;
+  return (
+    <div>
+      <p className="text-xs font-semibold text-gray-500 dark:text-gray-400 uppercase mb-2">{title}</p>
+      <table className="w-full text-sm">
+        <thead>
+          <tr className="bg-gray-100 dark:bg-gray-700 text-left">
+            {["", "Estimate", "In sample", "Max overcount"].map(h => (
+              <th key={h} className="px-3 py-2 font-semibold text-gray-600 dark:text-gray-300 text-xs whitespace-nowrap">{h}</th>
+            ))}
+          </tr>
+        </thead>
+        <tbody>
+          {rows.map(r => (
+            <tr key={r.value} className="border-b border-gray-100 dark:border-gray-700 hover:bg-gray-50 dark:hover:bg-gray-700/50">
+              <td className="px-3 py-2 font-mono text-xs">{r.value}</td>
+              <td className="px-3 py-2 font-semibold">~{fmt(r.estimate)}</td>
+              <td className="px-3 py-2">{fmt(r.sample)}</td>
+              <td className="px-3 py-2 text-xs text-gray-500">{fmt(r.max_overcount)}</td>
+            </tr>
+          ))}
+        </tbody>
+      </table>
+    </div>
+  );
+}
+
+export default function QuickLook({ data }) {
+  if (!data) return <p className="text-gray-400 text-sm">No quick look (enable the Quick Look flag).</p>;
+  const rate = (label, p) => (
+    <div className="bg-gray-50 dark:bg-gray-900 border border-gray-200 dark:border-gray-700 rounded-lg p-3">
+      <p className="text-xs font-semibold text-gray-500 mb-1">{label}</p>
+      <p className="font-semibold text-blue-700 dark:text-blue-300">{pct(p.value)}</p>
+      {p.ci95 && <p className="text-xs text-gray-400">95% CI {pct(p.ci95[0])} – {pct(p.ci95[1])}, {fmt(p.sample)} in sample</p>}
+    </div>
+  );
+  return (
+    <div className="space-y-4">
+      <p className="text-xs text-gray-500 dark:text-gray-400">
+        Sampled {fmt(data.sampled_bytes)} of {fmt(data.total_bytes)} bytes ({pct(data.fraction)}) in {data.windows} window(s);
+        figures below are extrapolated estimates.
+      </p>
+      <div className="grid grid-cols-1 md:grid-cols-2 gap-4">
+        {rate("SIP error rate (≥400)", data.error_rate)}
+        {rate("Diameter success", data.diameter_success)}
+      </div>
+      <div className="grid grid-cols-1 lg:grid-cols-2 gap-4 overflow-x-auto">
+        <EstimateTable title="Blocks & requests" rows={[["all blocks", data.blocks], ...Object.entries(data.methods)]} />
+        <EstimateTable title="Responses" rows={Object.entries(data.responses)} />
+        <EstimateTable title="Anomalies" rows={Object.entries(data.anomalies)} />
+        <TopTable title="Top numbers" rows={data.top_numbers} />
+        <TopTable title="Top peer IPs" rows={data.top_ips} />
+      </div>
+    </div>
+  );
+}
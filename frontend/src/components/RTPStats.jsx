@@ -47,6 +47,16 @@ export default function RTPStats({ data, sdp }) {
               </div>
             ))}
           </div>
+          {[["Codec mismatches", sdp.codec_mismatch], ["One-way media candidates", sdp.one_way_media]]
+            .filter(([, items]) => items?.length).map(([label, items]) => (
+            <div key={label} className="mt-3">
+              <p className="text-xs font-semibold text-gray-500 mb-1">{label} ({items.length})</p>
+              {items.map((a, i) => <div key={i} className="text-xs font-mono text-orange-600 dark:text-orange-300">{a}</div>)}
+            </div>
+          ))}
+          {sdp.dialogs?.length > 0 && (
+            <p className="text-xs text-gray-400 mt-2">{sdp.dialogs.length} SDP dialog(s) analyzed</p>
+          )}
         </div>
       )}
     </div>
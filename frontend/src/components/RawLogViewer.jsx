@@ -1,11 +1,36 @@
-import { useState } from "react";
+import { useState, useEffect } from "react";
+import axios from "axios";
 
-export default function RawLogViewer({ log }) {
-  const [search, setSearch] = useState("");
-  const lines = log?.split("\n") || [];
-  const filtered = search
-    ? lines.filter(l => l.toLowerCase().includes(search.toLowerCase()))
-    : lines;
+export default function RawLogViewer({ api, analysisId, total }) {
+  const [search,  setSearch]  = useState("");
+  const [isRegex, setIsRegex] = useState(false);
+  const [lines,   setLines]   = useState([]);
+  const [next,    setNext]    = useState(null);
+  const [count,   setCount]   = useState(total);
+  const [error,   setError]   = useState(null);
+  const [loading, setLoading] = useState(false);
+
+  const fetchLines = async (start, append) => {
+    if (!analysisId) return;
+    setLoading(true); setError(null);
+    try {
+      const params = { start, ...(search ? { [isRegex ? "regex" : "q"]: search } : {}) };
+      const res = await axios.get(`${api}/analysis/${analysisId}/raw`, { params });
+      setLines(prev => append ? [...prev, ...res.data.lines] : res.data.lines);
+      setNext(res.data.next);
+      setCount(res.data.total);
+    } catch (e) {
+      setError(e.response?.data?.detail || e.message);
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  // Search runs server-side; debounce so typing doesn't fire a request per key
+  useEffect(() => {
+    const t = setTimeout(() => fetchLines(0, false), search ? 300 : 0);
+    return () => clearTimeout(t);
+  }, [search, isRegex, analysisId]);
 
   return (
     <div>
@@ -16,23 +41,27 @@ export default function RawLogViewer({ log }) {
           placeholder="Filter lines..."
           className="border border-gray-300 dark:border-gray-600 rounded-lg px-3 py-1.5 text-sm bg-white dark:bg-gray-900 focus:outline-none focus:ring-2 focus:ring-blue-500 w-64"
         />
-        {search && (
-          <span className="text-xs text-gray-400 self-center">
-            {filtered.length} / {lines.length} lines
-          </span>
-        )}
+        <label className="text-xs text-gray-500 self-center flex items-center gap-1">
+          <input type="checkbox" checked={isRegex} onChange={e => setIsRegex(e.target.checked)} /> regex
+        </label>
+        <span className="text-xs text-gray-400 self-center">
+          {search ? `${lines.length}${next !== null ? "+" : ""} matches / ` : `${lines.length} / `}{count ?? "?"} lines
+        </span>
+        {error && <span className="text-xs text-red-500 self-center">{error}</span>}
       </div>
       <pre className="bg-gray-900 text-gray-300 text-xs p-4 rounded-lg overflow-auto max-h-[60vh] leading-relaxed whitespace-pre-wrap">
-        {filtered.map((line, i) => {
-          const hl = search && line.toLowerCase().includes(search.toLowerCase());
-          return (
-            <span key={i} className={hl ? "bg-yellow-400/30" : ""}>
-              {line}{"\n"}
-            </span>
-          );
-        })}
+        {lines.map(({ n, text }) => (
+          <span key={n} className={search ? "bg-yellow-400/30" : ""}>
+            {text}{"\n"}
+          </span>
+        ))}
       </pre>
+      {next !== null && (
+        <button onClick={() => fetchLines(next, true)} disabled={loading}
+          className="mt-3 px-4 py-1.5 bg-blue-600 hover:bg-blue-700 disabled:opacity-50 text-white text-sm font-medium rounded-lg">
+          {loading ? "Loading..." : "Load more"}
+        </button>
+      )}
     </div>
   );
 }
-
@@ -1,3 +1,6 @@
+import { useState, useEffect } from "react";
+import axios from "axios";
+
 const METHOD_COLOR = {
   INVITE: "method-INVITE", BYE: "method-BYE", CANCEL: "method-CANCEL",
   REGISTER: "method-REGISTER", PRACK: "method-PRACK", NOTIFY: "method-NOTIFY",
@@ -16,8 +19,66 @@ const getMethodClass = (m) => {
   return METHOD_COLOR[m] || "method-INTERNAL";
 };
 
-export default function Timeline({ events }) {
-  if (!events?.length) return <p className="text-gray-400 text-sm">No timeline events found.</p>;
+const inputCls = "border border-gray-300 dark:border-gray-600 rounded-lg px-3 py-1.5 text-sm bg-white dark:bg-gray-900 focus:outline-none focus:ring-2 focus:ring-blue-500";
+
+export default function Timeline({ events: firstPage, api, analysisId, cursor, total }) {
+  const [events,  setEvents]  = useState(firstPage || []);
+  const [next,    setNext]    = useState(cursor ?? null);
+  const [filter,  setFilter]  = useState({ method:"", call_id:"", regex:"" });
+  const [loading, setLoading] = useState(false);
+  const [error,   setError]   = useState(null);
+  const filtered = Object.values(filter).some(Boolean);
+
+  const fetchPage = async (from, append) => {
+    if (!analysisId) return;
+    setLoading(true); setError(null);
+    try {
+      const params = { cursor: from, ...Object.fromEntries(Object.entries(filter).filter(([, v]) => v)) };
+      const res = await axios.get(`${api}/analysis/${analysisId}/timeline`, { params });
+      setEvents(prev => append ? [...prev, ...res.data.events] : res.data.events);
+      setNext(res.data.next_cursor);
+    } catch (e) {
+      setError(e.response?.data?.detail || e.message);
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  // Server-side filtering — refetch from the start when a filter changes
+  useEffect(() => {
+    if (!filtered) { setEvents(firstPage || []); setNext(cursor ?? null); setError(null); return; }
+    const t = setTimeout(() => fetchPage(0, false), 300);
+    return () => clearTimeout(t);
+  }, [filter, analysisId]);
+
+  const setF = (k) => (e) => setFilter(f => ({ ...f, [k]: e.target.value }));
+
+  return (
+    <div>
+      {analysisId && (
+        <div className="mb-3 flex flex-wrap gap-2">
+          <input className={`${inputCls} w-32`} placeholder="Method" value={filter.method} onChange={setF("method")} />
+          <input className={`${inputCls} w-64`} placeholder="Call-ID" value={filter.call_id} onChange={setF("call_id")} />
+          <input className={`${inputCls} w-64`} placeholder="Regex" value={filter.regex} onChange={setF("regex")} />
+          <span className="text-xs text-gray-400 self-center">{events.length} / {total ?? events.length} events</span>
+          {error && <span className="text-xs text-red-500 self-center">{error}</span>}
+        </div>
+      )}
+      {!events.length
+        ? <p className="text-gray-400 text-sm">No timeline events found.</p>
+        : <TimelineTable events={events} />}
+      {next !== null && (
+        <button onClick={() => fetchPage(next, true)} disabled={loading}
+          className="mt-3 px-4 py-1.5 bg-blue-600 hover:bg-blue-700 disabled:opacity-50 text-white text-sm font-medium rounded-lg">
+          {loading ? "Loading..." : "Load more"}
+        </button>
+      )}
+    </div>
+  );
+}
+
+function TimelineTable({ events }) {
+  const multiNode = events.some(ev => ev.node);
   return (
     <div className="overflow-x-auto">
       <table className="w-full text-xs">
@@ -25,6 +86,7 @@ export default function Timeline({ events }) {
           <tr className="bg-gray-100 dark:bg-gray-700 text-left">
             <th className="px-3 py-2 font-semibold text-gray-600 dark:text-gray-300 whitespace-nowrap">#</th>
             <th className="px-3 py-2 font-semibold text-gray-600 dark:text-gray-300 whitespace-nowrap">Timestamp</th>
+            {multiNode && <th className="px-3 py-2 font-semibold text-gray-600 dark:text-gray-300">Node</th>}
             <th className="px-3 py-2 font-semibold text-gray-600 dark:text-gray-300">Dir</th>
             <th className="px-3 py-2 font-semibold text-gray-600 dark:text-gray-300">Method</th>
             <th className="px-3 py-2 font-semibold text-gray-600 dark:text-gray-300 w-full">Description</th>
@@ -35,6 +97,7 @@ export default function Timeline({ events }) {
             <tr key={i} className={`border-b border-gray-100 dark:border-gray-700 hover:bg-gray-50 dark:hover:bg-gray-700/50 ${i % 2 === 0 ? "" : "bg-gray-50/50 dark:bg-gray-800/50"}`}>
               <td className="px-3 py-1.5 text-gray-400">{i + 1}</td>
               <td className="px-3 py-1.5 font-mono text-gray-500 dark:text-gray-400 whitespace-nowrap">{ev.timestamp.replace("_", " ")}</td>
+              {multiNode && <td className="px-3 py-1.5 font-mono text-gray-500 dark:text-gray-400 whitespace-nowrap">{ev.node}</td>}
               <td className="px-3 py-1.5">
                 <span className={`dir-${ev.direction} text-xs font-mono`}>{ev.direction}</span>
               </td>
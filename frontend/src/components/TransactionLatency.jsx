@@ -0,0 +1,51 @@
+import { useState } from "react";
+
+const ms = (v) => v == null ? "—" : v >= 1000 ? `${(v / 1000).toFixed(2)} s` : `${v} ms`;
+
+export default function TransactionLatency({ data }) {
+  const [peer, setPeer] = useState("");
+  if (!data || !Object.keys(data.series ?? {}).length)
+    return <p className="text-gray-400 text-sm">No SIP transactions timed.</p>;
+
+  const series = peer ? data.by_peer[peer] ?? {} : data.series;
+  return (
+    <div className="space-y-3">
+      <div className="flex flex-wrap items-center gap-3 text-xs text-gray-500 dark:text-gray-400">
+        <select value={peer} onChange={e => setPeer(e.target.value)}
+          className="border border-gray-300 dark:border-gray-600 rounded px-2 py-1 bg-white dark:bg-gray-900 text-gray-700 dark:text-gray-200">
+          <option value="">All peers</option>
+          {Object.keys(data.by_peer).map(p => <option key={p} value={p}>{p}</option>)}
+        </select>
+        <span>{data.open} open</span>
+        <span>{data.expired} expired</span>
+        <span>{data.unmatched} unmatched response(s)</span>
+      </div>
+      <div className="overflow-x-auto">
+        <table className="w-full text-sm">
+          <thead>
+            <tr className="bg-gray-100 dark:bg-gray-700 text-left">
+              {["Request → response","Count","Min","p50","p90","p99","Max","Mean"].map(h => (
+                <th key={h} className="px-3 py-2 font-semibold text-gray-600 dark:text-gray-300 text-xs whitespace-nowrap">{h}</th>
+              ))}
+            </tr>
+          </thead>
+          <tbody>
+            {Object.entries(series).map(([name, h]) => (
+              <tr key={name} className="border-b border-gray-100 dark:border-gray-700 hover:bg-gray-50 dark:hover:bg-gray-700/50">
+                <td className="px-3 py-2 font-mono text-xs">{name}</td>
+                <td className="px-3 py-2">{h.count}</td>
+                <td className="px-3 py-2">{ms(h.min_ms)}</td>
+                <td className="px-3 py-2 font-semibold">{ms(h.p50_ms)}</td>
+                <td className="px-3 py-2">{ms(h.p90_ms)}</td>
+                <td className={`px-3 py-2 ${h.p99_ms > 5000 ? "text-red-600 dark:text-red-400" : ""}`}>{ms(h.p99_ms)}</td>
+                <td className="px-3 py-2">{ms(h.max_ms)}</td>
+                <td className="px-3 py-2 text-xs text-gray-500">{ms(h.mean_ms)}</td>
+              </tr>
+            ))}
+          </tbody>
+        </table>
+      </div>
+      <p className="text-xs text-gray-400">Percentiles interpolated within buckets (edges {data.edges_ms.map(ms).join(", ")}).</p>
+    </div>
+  );
+}